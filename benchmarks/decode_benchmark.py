@@ -0,0 +1,88 @@
+"""
+Micro-benchmark for core.utils.decode_json.
+
+Compares what the fetchers used to do (resp.json(), i.e. a full json.loads)
+with projected decoding, on synthetic /v3/batches/{slug}/details and
+/preview-test payloads shaped like the real ones.
+
+Usage: python -m benchmarks.decode_benchmark
+"""
+
+import json
+import time
+import tracemalloc
+
+from core import utils
+from core.content import SUBJECTS_SPEC, PREVIEW_TEST_SPEC
+
+def _attachment(i):
+    return {"_id": f"att{i}", "name": f"image_{i}.png", "baseUrl": "https://static.pw.live/", "key": f"k/{i}.png",
+            "organization": "5eb393ee95fab7468a79d189", "createdAt": "2024-01-01T00:00:00.000Z"}
+
+def batch_details_payload(subjects=40, teachers=6):
+    teacher = {"firstName": "A", "lastName": "B", "experience": "10 years", "qualification": "M.Sc",
+               "email": "t@pw.live", "description": "lorem ipsum " * 200, "imageId": _attachment(0),
+               "subjects": ["x"] * 20, "featuredLectures": [{"title": "intro " * 30, "url": "u"}] * 10}
+    return {"success": True, "data": {
+        "name": "Batch", "description": "d" * 5000, "meta": [{"k": "v" * 100}] * 100,
+        "subjects": [{
+            "_id": f"s{i}", "subject": f"Subject {i}", "slug": f"subject-{i}", "tagCount": 10,
+            "displayOrder": i, "lectureCount": 50, "imageId": _attachment(i),
+            "schedules": [{"day": d, "topic": "t" * 50} for d in range(30)],
+            "teacherIds": [dict(teacher) for _ in range(teachers)],
+        } for i in range(subjects)],
+    }}
+
+def preview_test_payload(questions=60):
+    return {"success": True, "data": {
+        "test": {"name": "DPP", "instructions": "i" * 5000},
+        "questions": [{
+            "yourResult": {"markedSolutions": ["o1"], "timeTaken": 40},
+            "question": {
+                "_id": f"q{i}", "questionNumber": i, "difficultyLevel": 2, "solutions": ["o1"],
+                "texts": {"en": "<p>" + "question text " * 200 + "</p>", "hi": "प्रश्न " * 200},
+                "options": [{"_id": f"o{j}", "texts": {"en": f"option {j} " * 20, "hi": "विकल्प " * 20}}
+                            for j in range(4)],
+                "imageIds": {"en": _attachment(i), "hi": _attachment(i)},
+                "solutionDescription": [{"imageIds": {"en": _attachment(i)}, "texts": {"en": "s" * 3000},
+                                         "videoDetails": {"videoUrl": "v" * 200}}],
+                "topicId": {"name": "Kinematics", "description": "t" * 1000},
+            },
+        } for i in range(questions)],
+    }}
+
+def measure(fn, content, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(content)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 1024
+
+def main():
+    cases = [
+        ("batch details", json.dumps(batch_details_payload()).encode(), SUBJECTS_SPEC),
+        ("preview-test", json.dumps(preview_test_payload()).encode(), PREVIEW_TEST_SPEC),
+    ]
+    backends = [("stdlib", None)]
+    if utils.orjson is not None:
+        backends.append(("orjson", utils.orjson))
+    installed = utils.orjson
+    print(f"{'payload':<15} {'decoder':<26} {'best ms':>9} {'peak KiB':>10}")
+    try:
+        for label, content, spec in cases:
+            print(f"{label:<15} {'json.loads (resp.json)':<26} %9.2f %10.0f" % measure(json.loads, content)
+                  + f"   [{len(content) / 1024:.0f} KiB body]")
+            for backend, module in backends:
+                utils.orjson = module
+                timing = measure(lambda c: utils.decode_json(c, spec), content)
+                print(f"{'':<15} {'decode_json/' + backend:<26} %9.2f %10.0f" % timing)
+    finally:
+        utils.orjson = installed
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Multi-session load test for the dashboard.
+
+Starts the mock API (benchmarks/mock_api.py) with injected latency, then drives
+many concurrent simulated sessions through streamlit.main using Streamlit's
+AppTest: login, batch/subject/topic selection, tab switches and a ZIP download.
+Reports p50/p95/p99 rerun latency per step, upstream request counts per
+endpoint, and process CPU time and RSS.
+
+Usage: python benchmarks/loadtest.py [--sessions 50] [--latency-ms 80] [--warm]
+"""
+
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# The dashboard script is itself called streamlit.py, so the real streamlit
+# package must be imported before the repository root is put on sys.path.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path = [p for p in sys.path if os.path.abspath(p or ".") != REPO_ROOT]
+from streamlit import config as st_config, logger as st_logger
+from streamlit.runtime.scriptrunner import magic
+from streamlit.testing.v1 import AppTest
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.mock_api import MockAPI
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SCRIPT = os.path.join(REPO_ROOT, "streamlit.py")
+TOKEN = "loadtest-token"
+
+# Every AppTest compiles the script on its first run, and concurrent ast.parse
+# calls can fail on some CPython 3.11 releases; compile one session at a time.
+_compile_lock = threading.Lock()
+_add_magic = magic.add_magic
+
+def _locked_add_magic(code, script_path):
+    with _compile_lock:
+        return _add_magic(code, script_path)
+
+magic.add_magic = _locked_add_magic
+
+def rss_mb():
+    """Current RSS if psutil is installed, otherwise peak RSS from getrusage."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+class Session:
+    """One simulated user; every AppTest.run() is one timed rerun."""
+
+    def __init__(self, index, timeout, seed):
+        self.index = index
+        self.rng = random.Random(seed + index)
+        self.app = AppTest.from_file(SCRIPT, default_timeout=timeout)
+        self.timings = []  # [(step, seconds)]
+        self.errors = []
+
+    def _run(self, step, action=None):
+        start = time.perf_counter()
+        if action is None:
+            self.app.run()
+        else:
+            action().run()
+        self.timings.append((step, time.perf_counter() - start))
+        if self.app.exception:
+            self.errors.append(f"{step}: {self.app.exception[0].message}")
+
+    def _select(self, step, key):
+        box = self.app.selectbox(key=key)
+        self._run(step, lambda: box.select_index(self.rng.randrange(len(box.options))))
+
+    def run(self):
+        self._run("login")
+        self._select("select batch", "batch_idx")
+        self._select("select subject", "subject_idx")
+        self._select("select topic", "topic_idx")
+        self._run("tab DPP", lambda: self.app.radio(key="content_tab").set_value("DPP"))
+        self._run("tab Notes", lambda: self.app.radio(key="content_tab").set_value("Notes"))
+        zip_buttons = [b for b in self.app.button if (b.key or "").endswith("-zip")]
+        if zip_buttons:
+            self._run("zip download", zip_buttons[0].click)
+        else:
+            self.errors.append("zip download: no ZIP button rendered")
+        return self
+
+def login_via_form(timeout):
+    """Exercises the paste-token login form once, which writes the shared token file."""
+    app = AppTest.from_file(SCRIPT, default_timeout=timeout).run()
+    app.text_area[0].input(TOKEN)
+    next(b for b in app.button if b.label == "Verify Token & Login").click().run()
+    return app
+
+def percentiles(values):
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+def report(sessions, counts, wall, cpu, rss_before, rss_after):
+    by_step = defaultdict(list)
+    for session in sessions:
+        for step, seconds in session.timings:
+            by_step[step].append(seconds * 1000)
+    every = [ms for values in by_step.values() for ms in values]
+    print(f"\n{'step':<16} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for step, values in list(by_step.items()) + [("all reruns", every)]:
+        p50, p95, p99 = percentiles(values)
+        print(f"{step:<16} {len(values):>5} {p50:>9.0f} {p95:>9.0f} {p99:>9.0f}")
+    print(f"\nupstream requests ({sum(counts.values())} total):")
+    for endpoint, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  {endpoint:<20} {count:>6}")
+    errors = [e for s in sessions for e in s.errors]
+    print(f"\nsessions: {len(sessions)}  wall: {wall:.1f}s  cpu: {cpu:.1f}s ({cpu / wall:.0%} of one core)"
+          f"  rss: {rss_before:.0f} -> {rss_after:.0f} MiB  errors: {len(errors)}")
+    for error in errors[:10]:
+        print(f"  {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test against a mock API.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=80, help="injected mock API latency")
+    parser.add_argument("--ramp", type=float, default=0, help="seconds over which session starts are spread")
+    parser.add_argument("--timeout", type=float, default=120, help="per-rerun AppTest timeout")
+    parser.add_argument("--warm", action="store_true", help="keep the on-disk cache from a previous run")
+    parser.add_argument("--data-dir", default=None, help="data directory (default: a fresh temp dir)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    # AppTest sessions run outside a server, which Streamlit warns about on every thread
+    st_config.set_option("logger.level", "error")
+    st_logger.set_log_level("error")
+
+    api = MockAPI(latency_ms=args.latency_ms).start()
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="pw-loadtest-")
+    if not args.warm:
+        for root, _, files in os.walk(os.path.join(data_dir, "cache")):
+            for name in files:
+                os.remove(os.path.join(root, name))
+    token_file = os.path.join(data_dir, "token.txt")
+    if os.path.exists(token_file):
+        os.remove(token_file)
+    # Read by core.utils / core.cache when the script first imports them
+    os.environ["PW_BASE_URL"] = api.base_url
+    os.environ["PW_DATA_DIR"] = data_dir
+    print(f"mock API {api.base_url} ({args.latency_ms:.0f} ms), data dir {data_dir}")
+
+    login_via_form(args.timeout)
+    if not os.path.exists(token_file):
+        sys.exit("login form did not store a token; aborting")
+    api.reset_counts()
+
+    rss_before, cpu_before = rss_mb(), cpu_seconds()
+    started = time.perf_counter()
+
+    def start_session(index):
+        if args.ramp:
+            time.sleep(args.ramp * index / args.sessions)
+        session = Session(index, args.timeout, args.seed)
+        try:
+            return session.run()
+        except Exception as e:
+            session.errors.append(f"session {index}: {e!r}")
+            return session
+
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        sessions = list(pool.map(start_session, range(args.sessions)))
+    wall = time.perf_counter() - started
+    report(sessions, api.request_counts(), wall, cpu_seconds() - cpu_before, rss_before, rss_mb())
+    api.stop()
+
+if __name__ == "__main__":
+    main()
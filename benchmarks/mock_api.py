@@ -0,0 +1,173 @@
+"""
+Local mock of the api.penpencil.co endpoints the dashboard uses, with injected latency.
+
+Serves a deterministic tree of batches/subjects/topics, Notes/DPP listings and
+attachment files, and counts every request per endpoint. Used by
+benchmarks/loadtest.py; can also be run standalone:
+
+    python benchmarks/mock_api.py --port 8765 --latency-ms 80
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+ROUTES = [
+    ("verify-token", re.compile(r"^/v3/oauth/verify-token$")),
+    ("purchased-batches", re.compile(r"^/batch-service/v1/batches/purchased-batches$")),
+    ("batch-details", re.compile(r"^/v3/batches/(?P<batch>[^/]+)/details$")),
+    ("topics", re.compile(r"^/v2/batches/(?P<batch>[^/]+)/subject/(?P<subject>[^/]+)/topics$")),
+    ("contents", re.compile(r"^/v2/batches/(?P<batch>[^/]+)/subject/(?P<subject>[^/]+)/contents$")),
+    ("announcements", re.compile(r"^/v1/batches/(?P<batch>[^/]+)/announcement$")),
+    ("files", re.compile(r"^/files/(?P<name>.+)$")),
+]
+
+class MockAPI:
+    """
+    Threaded mock server. `latency_ms` (+/- `jitter_ms`) is added to every response;
+    `file_kb` sets the size of attachment bodies.
+    """
+
+    def __init__(self, batches=3, subjects=5, topics=12, files=8, latency_ms=80, jitter_ms=20, file_kb=256):
+        self.shape = {"batches": batches, "subjects": subjects, "topics": topics, "files": files}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.file_body = bytes(random.Random(0).getrandbits(8) for _ in range(file_kb * 1024))
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self.server = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts.clear()
+
+    def request_counts(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def payload(self, route, params, query):
+        n = self.shape
+        if route == "verify-token":
+            return {"success": True, "data": {"isVerified": True}}
+        if route == "purchased-batches":
+            return {"success": True, "data": [
+                {"_id": f"b{i}", "name": f"Batch {i}", "slug": f"batch-{i}", "startDate": "2026-01-01",
+                 "endDate": "2026-12-31", "expiryDate": "2027-03-31", "description": "x" * 2000}
+                for i in range(n["batches"])
+            ]}
+        if route == "batch-details":
+            return {"success": True, "data": {"subjects": [
+                {"_id": f"{params['batch']}-s{i}", "subject": f"Subject {i}", "slug": f"subject-{i}",
+                 "tagCount": n["topics"], "displayOrder": i, "lectureCount": 40,
+                 "teacherIds": [{"firstName": "T", "lastName": str(i), "description": "y" * 2000}]}
+                for i in range(n["subjects"])
+            ]}}
+        if route == "topics":
+            if query.get("page", ["1"])[0] != "1":
+                return {"success": True, "data": []}
+            return {"success": True, "data": [
+                {"_id": f"{params['batch']}-{params['subject']}-t{i}", "name": f"Chapter {i}",
+                 "slug": f"chapter-{i}", "displayOrder": i, "notes": n["files"], "exercises": 2,
+                 "videos": 5, "lectureVideos": 5}
+                for i in range(n["topics"])
+            ]}
+        if route == "contents":
+            kind = query.get("contentType", ["notes"])[0]
+            tag = query.get("tag", [""])[0]
+            prefix = f"{params['batch']}-{params['subject']}-{tag}-{kind}"
+            return {"success": True, "data": [{"homeworkIds": [{
+                "topic": f"{kind} {tag}",
+                "attachmentIds": [
+                    {"_id": f"{prefix}-{i}", "name": f"{kind}-{tag}-{i}.pdf",
+                     "baseUrl": f"{self.base_url}/files/", "key": f"{prefix}-{i}.pdf"}
+                    for i in range(n["files"])
+                ],
+            }]}]}
+        if route == "announcements":
+            return {"success": True, "data": []}
+        return None
+
+    def handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                parts = urlsplit(self.path)
+                for route, pattern in ROUTES:
+                    match = pattern.match(parts.path)
+                    if match:
+                        break
+                else:
+                    route, match = None, None
+                with api._lock:
+                    api.counts[route or "unknown"] += 1
+                delay = max(0, api.latency_ms + random.uniform(-api.jitter_ms, api.jitter_ms)) / 1000
+                time.sleep(delay)
+                if route == "files":
+                    body, ctype = api.file_body, "application/pdf"
+                else:
+                    data = api.payload(route, match.groupdict() if match else {}, parse_qs(parts.query))
+                    if data is None:
+                        self.send_response(404)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    body, ctype = json.dumps(data).encode(), "application/json"
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                self._respond()
+
+        return Handler
+
+    def start(self, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="mock-api").start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock PW API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    args = parser.parse_args()
+    api = MockAPI(latency_ms=args.latency_ms).start(port=args.port)
+    print(f"Mock API on {api.base_url} (set PW_BASE_URL to use it)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
+
+if __name__ == "__main__":
+    main()
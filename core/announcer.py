@@ -1,12 +1,17 @@
-import requests
-from utils import verify_token, get_auth_headers, BASE_URL
+from concurrent.futures import ThreadPoolExecutor
 
-def fetch_batches(token, page=1):
-    """
-    Fetches all purchased batches for the authenticated user.
-    Returns a list of dicts with: name, _id, slug, startDate, endDate, expiryDate.
-    """
-    # Verify token before proceeding
+from core.http import http_get
+from core.limiter import inherit_priority
+from core.utils import verify_token, get_auth_headers, decode_json, fields, BASE_URL
+from core.profiling import traced
+
+BATCHES_SPEC = fields("success", "message", data=[fields("name", "_id", "slug", "startDate", "endDate", "expiryDate")])
+ANNOUNCEMENTS_SPEC = fields("success", "message", data=[fields(
+    "announcement", "_id", "scheduleTime", attachment=fields("name", "baseUrl", "key")
+)])
+
+def _verification_error(token):
+    """Returns an error dict if the token does not verify, else None."""
     verification = verify_token(token)
     if not verification.get("success"):
         return {
@@ -14,12 +19,24 @@ def fetch_batches(token, page=1):
             "error_message": verification.get("error_message", "Token verification failed"),
             "error_status": verification.get("error_status", None)
         }
-    
+    return None
+
+@traced
+def fetch_batches(token, page=1):
+    """
+    Fetches all purchased batches for the authenticated user.
+    Returns a list of dicts with: name, _id, slug, startDate, endDate, expiryDate.
+    """
+    # Verify token before proceeding
+    error = _verification_error(token)
+    if error:
+        return error
+
     url = f"{BASE_URL}/batch-service/v1/batches/purchased-batches?amount=paid&page={page}&type=ALL"
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="purchased-batches")
+        data = decode_json(resp.content, BATCHES_SPEC)
         if data.get("success") and isinstance(data.get("data"), list):
             result = []
             for batch in data["data"]:
@@ -41,25 +58,24 @@ def fetch_batches(token, page=1):
     except Exception as e:
         return {"success": False, "error_message": str(e), "error_status": None}
 
-def fetch_announcements(token, batch_id, page=1):
+@traced
+def fetch_announcements(token, batch_id, page=1, verify=True):
     """
     Fetches announcements for a specific batch.
     Returns a list of dicts with: announcement, _id, scheduleTime, attachment (name, baseUrl, key).
+    Pass verify=False when the token was already verified for this polling round.
     """
     # Verify token before proceeding
-    verification = verify_token(token)
-    if not verification.get("success"):
-        return {
-            "success": False,
-            "error_message": verification.get("error_message", "Token verification failed"),
-            "error_status": verification.get("error_status", None)
-        }
-    
+    if verify:
+        error = _verification_error(token)
+        if error:
+            return error
+
     url = f"{BASE_URL}/v1/batches/{batch_id}/announcement?page={page}"
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="announcements")
+        data = decode_json(resp.content, ANNOUNCEMENTS_SPEC)
         if data.get("success") and isinstance(data.get("data"), list):
             result = []
             for ann in data["data"]:
@@ -87,3 +103,171 @@ def fetch_announcements(token, batch_id, page=1):
             }
     except Exception as e:
         return {"success": False, "error_message": str(e), "error_status": None}
+
+def _high_water(announcement):
+    return {"_id": announcement.get("_id"), "scheduleTime": announcement.get("scheduleTime")}
+
+def _is_older(announcement, mark):
+    mark_time = mark.get("scheduleTime")
+    return bool(mark_time and announcement.get("scheduleTime") and announcement["scheduleTime"] < mark_time)
+
+def _is_seen(announcement, high_water):
+    """
+    True once paging (newest first) reaches the high-water mark. Items sharing
+    the mark's scheduleTime are still new unless they are the mark itself.
+    """
+    return announcement.get("_id") == high_water.get("_id") or _is_older(announcement, high_water)
+
+def _scan(token, batch_id, first_page, max_pages, after, until):
+    """
+    Pages (newest first) from `first_page`, skipping items up to and including
+    `after` (None skips nothing) and collecting the rest until `until` is seen.
+    Returns {"success", "announcements", "complete", "page" (last page read)}.
+    """
+    items = []
+    collecting = after is None
+    page = first_page
+    for page in range(first_page, first_page + max_pages):
+        res = fetch_announcements(token, batch_id, page=page, verify=False)
+        if not res.get("success"):
+            return res
+        if not res["announcements"]:
+            return {"success": True, "announcements": items, "complete": True, "page": page}
+        for ann in res["announcements"]:
+            if not collecting:
+                if ann.get("_id") == after.get("_id"):
+                    collecting = True
+                    continue
+                if not _is_older(ann, after):
+                    continue
+                collecting = True
+            if _is_seen(ann, until):
+                return {"success": True, "announcements": items, "complete": True, "page": page}
+            items.append(ann)
+    return {"success": True, "announcements": items, "complete": False, "page": page}
+
+@traced
+def sync_announcements(token, batch_id, high_water, max_pages=20, verify=True):
+    """
+    Incrementally fetches announcements newer than `high_water`
+    ({"_id", "scheduleTime"} of the newest announcement seen so far).
+    Pages forward from page 1 (newest first) only until an already-seen item,
+    so steady-state polling is a single request.
+    Returns {"success", "announcements" (new only, newest first), "high_water", "truncated"}.
+    Without a high-water mark (first sync) the delta is empty and only the mark
+    is set, so existing history is never reported as new; use
+    backfill_announcements() to load it explicitly.
+    If `max_pages` run out before the mark is reached, "truncated" is True and
+    the returned mark records the unreported range under "gaps"; passing it
+    back makes the next syncs continue there (after checking for newer items)
+    until the range is closed.
+    """
+    if verify:
+        error = _verification_error(token)
+        if error:
+            return error
+    if not high_water:
+        res = fetch_announcements(token, batch_id, page=1, verify=False)
+        if not res.get("success"):
+            return res
+        newest = res["announcements"][:1]
+        return {
+            "success": True,
+            "announcements": [],
+            "high_water": _high_water(newest[0]) if newest else None,
+            "truncated": False,
+        }
+
+    head = _scan(token, batch_id, 1, max_pages, None, high_water)
+    if not head.get("success"):
+        return head
+    budget = max_pages - head["page"]
+    delta = list(head["announcements"])
+    gaps = list(high_water.get("gaps", []))
+    if not head["complete"]:
+        gaps.insert(0, {"after": _high_water(delta[-1]), "page": head["page"], "until": _high_water(high_water)})
+    remaining = []
+    for gap in gaps:
+        if budget <= 0:
+            remaining.append(gap)
+            continue
+        res = _scan(token, batch_id, gap["page"], budget, gap["after"], gap["until"])
+        if not res.get("success"):
+            return res
+        budget -= res["page"] - gap["page"] + 1
+        delta += res["announcements"]
+        if not res["complete"]:
+            after = _high_water(res["announcements"][-1]) if res["announcements"] else gap["after"]
+            remaining.append({"after": after, "page": res["page"], "until": gap["until"]})
+    mark = _high_water(head["announcements"][0] if head["announcements"] else high_water)
+    if remaining:
+        mark["gaps"] = remaining
+    return {"success": True, "announcements": delta, "high_water": mark, "truncated": bool(remaining)}
+
+@traced
+def backfill_announcements(token, batch_id, max_pages=20, max_workers=4, verify=True):
+    """
+    Fetches the full announcement history of a batch once, `max_workers` pages
+    at a time, stopping at the first empty page.
+    Returns {"success", "announcements" (newest first), "high_water"}.
+    """
+    if verify:
+        error = _verification_error(token)
+        if error:
+            return error
+    history = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for start in range(1, max_pages + 1, max_workers):
+            pages = range(start, min(start + max_workers, max_pages + 1))
+            results = list(pool.map(
+                inherit_priority(lambda page: fetch_announcements(token, batch_id, page=page, verify=False)), pages
+            ))
+            exhausted = False
+            for res in results:
+                if not res.get("success"):
+                    return res
+                if not res["announcements"]:
+                    exhausted = True
+                    break
+                history.extend(res["announcements"])
+            if exhausted:
+                break
+    # Pages can overlap if announcements are posted mid-backfill
+    seen = set()
+    history = [ann for ann in history if not (ann["_id"] in seen or seen.add(ann["_id"]))]
+    return {
+        "success": True,
+        "announcements": history,
+        "high_water": _high_water(history[0]) if history else None,
+    }
+
+@traced
+def sync_batches(token, batch_ids, high_waters, max_workers=4):
+    """
+    Syncs several batches concurrently with a single token verification.
+    `high_waters` is {batch_id: high_water}; batches without one only get a mark
+    (see sync_announcements).
+    Returns {"success", "announcements": {batch_id: delta}, "high_waters": updated marks,
+    "truncated": [batch_id, ...]}. Batches whose sync fails keep their previous
+    mark and get no delta; truncated batches report a partial delta and a mark
+    that resumes the rest on the next sync.
+    """
+    error = _verification_error(token)
+    if error:
+        return error
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = dict(zip(batch_ids, pool.map(
+            inherit_priority(lambda batch_id: sync_announcements(token, batch_id, high_waters.get(batch_id), verify=False)),
+            batch_ids,
+        )))
+    marks = dict(high_waters)
+    deltas = {}
+    truncated = []
+    for batch_id, res in results.items():
+        if res.get("success"):
+            deltas[batch_id] = res["announcements"]
+            if res["truncated"]:
+                truncated.append(batch_id)
+            if res["high_water"]:
+                marks[batch_id] = res["high_water"]
+    return {"success": True, "announcements": deltas, "high_waters": marks, "truncated": truncated}
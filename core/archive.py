@@ -0,0 +1,92 @@
+# core/archive.py
+
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import LargeZipFile
+
+from core import cache, cancel
+from core.limiter import inherit_priority
+from core.profiling import span
+
+# zlib releases the GIL while compressing, so a thread pool spreads the work
+# over all cores and also overlaps it with the member downloads.
+ZIP_WORKERS = int(os.environ.get("PW_ZIP_WORKERS", min(16, (os.cpu_count() or 1) + 4)))
+ZIP_LEVEL = int(os.environ.get("PW_ZIP_LEVEL", 6))
+SAMPLE_SIZE = 64 * 1024
+STORE_RATIO = 0.9  # store members whose sample does not shrink below this ratio (PDFs, images)
+
+STORED, DEFLATED = 0, 8
+_UTF8_FLAG = 0x800
+_MAX_32 = 0xFFFFFFFF
+
+_pool = ThreadPoolExecutor(max_workers=ZIP_WORKERS, thread_name_prefix="pw-zip")
+
+def worth_deflating(data):
+    """Compresses a sample from the middle of `data` at level 1 and checks that it shrinks."""
+    if len(data) <= SAMPLE_SIZE:
+        sample = data
+    else:
+        start = (len(data) - SAMPLE_SIZE) // 2
+        sample = data[start:start + SAMPLE_SIZE]
+    return bool(sample) and len(zlib.compress(sample, 1)) < len(sample) * STORE_RATIO
+
+def compress_member(data):
+    """Returns (method, crc32, payload) for one member; payload is raw deflate or the data itself."""
+    crc = zlib.crc32(data)
+    if not worth_deflating(data):
+        return STORED, crc, data
+    compressor = zlib.compressobj(ZIP_LEVEL, zlib.DEFLATED, -15)
+    return DEFLATED, crc, compressor.compress(data) + compressor.flush()
+
+def _dos_time(timestamp):
+    t = time.localtime(timestamp)
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+def _load_and_compress(loader):
+    data = loader()
+    if data is None:
+        return None
+    return len(data), compress_member(data)
+
+def build_zip(loaders):
+    """
+    Builds a ZIP archive from {filename: loader}, where each loader returns the
+    member's bytes (or None to leave it out). Members are loaded and compressed
+    in parallel, then written in the given order. Returns the archive as bytes.
+    Raises cancel.Cancelled (and drops the members not started yet) if the
+    caller's cancel scope is cancelled. Loaders run in the caller's cancel
+    scope, priority class and offline mode.
+    """
+    task = cache.inherit_offline(cancel.inherit_scope(inherit_priority(_load_and_compress)))
+    futures = [(name, _pool.submit(task, loader)) for name, loader in loaders.items()]
+    dos_time, dos_date = _dos_time(time.time())
+    parts, central, offset = [], [], 0
+    with span("zip assemble"):
+        for name, future in futures:
+            try:
+                # Loaders swallow request errors, so check the scope rather than rely on an exception
+                result = future.result()
+                cancel.check()
+            except cancel.Cancelled:
+                for _, pending in futures:
+                    pending.cancel()
+                raise
+            if result is None:
+                continue
+            size, (method, crc, payload) = result
+            if max(size, len(payload), offset) > _MAX_32 or len(central) >= 0xFFFF:
+                raise LargeZipFile("export too large for a ZIP without ZIP64 extensions")
+            encoded = name.encode("utf-8")
+            fields = (20, _UTF8_FLAG, method, dos_time, dos_date, crc, len(payload), size, len(encoded))
+            header = struct.pack("<IHHHHHIIIHH", 0x04034B50, *fields, 0) + encoded
+            central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 20, *fields, 0, 0, 0, 0, 0, offset)
+                           + encoded)
+            parts += [header, payload]
+            offset += len(header) + len(payload)
+    directory = b"".join(central)
+    end = struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(central), len(central), len(directory), offset, 0)
+    return b"".join(parts) + directory + end
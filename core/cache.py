@@ -0,0 +1,143 @@
+# core/cache.py
+
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from core import cancel
+from core.limiter import priority
+
+DATA_DIR = os.environ.get("PW_DATA_DIR", "data")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+# Local-first: PW_OFFLINE=1 never touches the network; otherwise entries older
+# than PW_STALE_AFTER seconds are still served and refreshed in the background.
+OFFLINE = os.environ.get("PW_OFFLINE", "").lower() in ("1", "true", "yes")
+STALE_AFTER = float(os.environ.get("PW_STALE_AFTER", 600))
+
+_local = threading.local()
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pw-cache-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def is_offline():
+    """True if the current thread (or the whole process, via PW_OFFLINE) is in offline mode."""
+    return getattr(_local, "offline", None) or OFFLINE
+
+@contextmanager
+def offline_mode(enabled=True):
+    """Puts the current thread (e.g. one dashboard session's rerun) in offline mode."""
+    previous = getattr(_local, "offline", None)
+    _local.offline = enabled
+    try:
+        yield
+    finally:
+        _local.offline = previous
+
+def inherit_offline(fn):
+    """Wraps fn so it runs in the caller's offline mode, e.g. when handed to a thread pool."""
+    enabled = getattr(_local, "offline", None)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with offline_mode(enabled):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def token_scope(token):
+    """Short stable hash of a token, so cache files never contain the token itself."""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+def _path(key):
+    kind = key[0]
+    digest = hashlib.sha1(json.dumps(key).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{kind}-{digest}.json")
+
+def read(key):
+    """
+    Returns the cached entry for `key` (a tuple starting with a kind, e.g.
+    ("notes", scope, batch, subject, topic)) as {"fetched_at", "value"}, or None.
+    """
+    try:
+        with open(_path(key), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def write(key, value):
+    """Atomically stores `value`; readers in other processes never see a partial file."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _path(key)
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"fetched_at": time.time(), "value": value}, f)
+    os.replace(tmp, path)
+
+def age(entry):
+    """Seconds since the entry was fetched."""
+    return time.time() - entry["fetched_at"]
+
+def _store(key, entry, value):
+    """
+    Writes a freshly loaded value. The fetchers turn errors into empty results,
+    so an empty one is never stored: the previous entry is kept, or without one
+    the value is returned uncached ("fetched_at": None) and loaded again next time.
+    """
+    if value:
+        write(key, value)
+        return {"fetched_at": time.time(), "value": value}
+    if entry is None:
+        return {"fetched_at": None, "value": value}
+    return entry
+
+def _refresh_in_background(key, loader):
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            with priority("background"):
+                _store(key, read(key), loader())
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+    _refresh_pool.submit(run)
+
+def cached_entry(key, loader, max_age=None, refresh=False, stale_after=None, default=None):
+    """
+    Like cached(), but returns the entry: {"fetched_at", "value"}, plus
+    "stale": True when it is older than `stale_after` seconds. Stale entries
+    are returned immediately and refreshed in the background. In offline mode
+    the loader is never called; a missing entry comes back as
+    {"fetched_at": None, "value": default}. If the calling thread's cancel scope
+    is cancelled while loading, nothing is stored and cancel.Cancelled is raised
+    (the fetchers turn errors into empty results, which must not be cached).
+    """
+    entry = read(key)
+    if is_offline():
+        if entry is None:
+            return {"fetched_at": None, "value": default, "stale": True}
+        return dict(entry, stale=True)
+    if entry is not None and not refresh and (max_age is None or age(entry) <= max_age):
+        stale = stale_after is not None and age(entry) > stale_after
+        if stale:
+            _refresh_in_background(key, loader)
+        return dict(entry, stale=stale)
+    value = loader()
+    cancel.check()
+    return dict(_store(key, entry, value), stale=False)
+
+def cached(key, loader, max_age=None, refresh=False):
+    """
+    Returns the cached value for `key`, calling loader() and storing its result
+    when there is no entry, it is older than `max_age` seconds, or refresh=True.
+    The fetchers return empty results on errors, so empty results are never
+    stored (see _store).
+    """
+    return cached_entry(key, loader, max_age=max_age, refresh=refresh)["value"]
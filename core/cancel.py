@@ -0,0 +1,102 @@
+# core/cancel.py
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+POLL_INTERVAL = 0.05  # seconds between cancellation checks while waiting on other threads
+
+class Cancelled(Exception):
+    """Raised inside a cancelled scope: nobody is waiting for the interrupted work any more."""
+
+class CancelScope:
+    """
+    A group of requests that are abandoned together, e.g. everything one
+    dashboard rerun fetches. cancel() is safe to call from any thread; requests
+    in the scope stop at their next checkpoint (limiter queue, retry backoff,
+    between body chunks) and give their connection and limiter slot back.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn()
+
+    def on_cancel(self, fn):
+        """Calls fn() on cancel (right away if already cancelled); returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return lambda: self._discard(fn)
+        fn()
+        return lambda: None
+
+    def _discard(self, fn):
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+_local = threading.local()
+
+def current():
+    """The current thread's cancel scope, or None."""
+    return getattr(_local, "scope", None)
+
+@contextmanager
+def scope(cancel_scope):
+    """Makes requests sent inside the block (on this thread) part of `cancel_scope`."""
+    previous = current()
+    _local.scope = cancel_scope
+    try:
+        yield cancel_scope
+    finally:
+        _local.scope = previous
+
+def inherit_scope(fn):
+    """Wraps fn so it runs in the caller's cancel scope, e.g. when handed to a thread pool."""
+    cancel_scope = current()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with scope(cancel_scope):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def cancelled():
+    cancel_scope = current()
+    return cancel_scope is not None and cancel_scope.cancelled
+
+def check():
+    """Raises Cancelled if the current thread's scope has been cancelled."""
+    if cancelled():
+        raise Cancelled("cancelled by a newer navigation")
+
+def sleep(seconds):
+    """time.sleep that wakes up (and raises Cancelled) when the current scope is cancelled."""
+    cancel_scope = current()
+    if cancel_scope is None:
+        time.sleep(seconds)
+    elif cancel_scope._event.wait(seconds):
+        check()
+
+def wait(event):
+    """Waits for a threading.Event set by another thread, or until the current scope is cancelled."""
+    if current() is None:
+        event.wait()
+        return
+    while not event.wait(POLL_INTERVAL):
+        check()
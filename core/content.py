@@ -1,6 +1,28 @@
-import requests
-from core.utils import get_auth_headers, BASE_URL
+from core.http import http_get
+from core.utils import get_auth_headers, decode_json, fields, BASE_URL
+from core.profiling import traced
 
+# Fields each endpoint's fetcher actually reads; everything else is dropped while decoding
+ATTACHMENT_FIELDS = fields("_id", "baseUrl", "key", "name")
+BATCHES_SPEC = fields("success", data=[fields("name", "slug", "startDate", "endDate", "expiryDate")])
+SUBJECTS_SPEC = fields(data=fields(subjects=[fields(
+    "_id", "subject", "slug", "tagCount", "displayOrder", "lectureCount",
+    teacherIds=[fields("firstName", "lastName", "experience", "qualification", "email")],
+)]))
+TOPICS_SPEC = fields(data=[fields(
+    "_id", "name", "displayOrder", "notes", "exercises", "videos", "lectureVideos", "slug"
+)])
+CONTENTS_SPEC = fields(data=[fields(homeworkIds=[fields("topic", attachmentIds=[ATTACHMENT_FIELDS])])])
+DPP_TESTS_SPEC = fields(data=[fields(testStudentMapping=fields("_id"))])
+PREVIEW_TEST_SPEC = fields(data=fields(questions=[fields(question=fields(
+    "_id", "questionNumber", "solutions", "difficultyLevel",
+    options=[fields("_id", texts=fields("en"))],
+    imageIds=fields(en=ATTACHMENT_FIELDS),
+    solutionDescription=[fields(imageIds=fields(en=ATTACHMENT_FIELDS))],
+    topicId=fields("name"),
+))]))
+
+@traced
 def fetch_batches(token, page=1):
     """
     Fetch user-purchased batches.
@@ -9,8 +31,8 @@ def fetch_batches(token, page=1):
     url = f"{BASE_URL}/batch-service/v1/batches/purchased-batches?amount=paid&page={page}&type=ALL"
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="purchased-batches")
+        data = decode_json(resp.content, BATCHES_SPEC)
         if data.get("success") and isinstance(data.get("data"), list):
             return [
                 {
@@ -26,6 +48,7 @@ def fetch_batches(token, page=1):
     except Exception as e:
         return []
 
+@traced
 def fetch_subjects(token, batch_slug):
     """
     Fetches all subjects for a given batch.
@@ -35,8 +58,8 @@ def fetch_subjects(token, batch_slug):
     url = f"{BASE_URL}/v3/batches/{batch_slug}/details"
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="batch-details")
+        data = decode_json(resp.content, SUBJECTS_SPEC)
         subjects = data.get("data", {}).get("subjects", [])
         res = []
         for s in subjects:
@@ -62,6 +85,7 @@ def fetch_subjects(token, batch_slug):
     except Exception as e:
         return []
 
+@traced
 def fetch_topics(token, batch_slug, subject_slug, page=1):
     """
     Fetch topics/chapters for a subject in a batch.
@@ -71,8 +95,8 @@ def fetch_topics(token, batch_slug, subject_slug, page=1):
     url = f"{BASE_URL}/v2/batches/{batch_slug}/subject/{subject_slug}/topics?page={page}"
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="topics")
+        data = decode_json(resp.content, TOPICS_SPEC)
         topics = data.get("data", [])
         return [
             {
@@ -90,6 +114,7 @@ def fetch_topics(token, batch_slug, subject_slug, page=1):
     except Exception as e:
         return []
 
+@traced
 def fetch_notes(token, batch_slug, subject_slug, topic_slug, page=1):
     """
     Fetch notes (attachments) for a given topic in a subject of a batch.
@@ -101,8 +126,8 @@ def fetch_notes(token, batch_slug, subject_slug, topic_slug, page=1):
            f"/contents?page={page}&contentType=notes&tag={topic_slug}")
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="contents")
+        data = decode_json(resp.content, CONTENTS_SPEC)
         notes_list = []
         for entry in data.get("data", []):
             for hw in entry.get("homeworkIds", []):
@@ -122,6 +147,7 @@ def fetch_notes(token, batch_slug, subject_slug, topic_slug, page=1):
     except Exception:
         return []
 
+@traced
 def fetch_dpp(token, batch_slug, subject_slug, topic_slug, page=1):
     """
     Fetch DPP Notes (attachments) for a given topic in a subject of a batch.
@@ -133,8 +159,8 @@ def fetch_dpp(token, batch_slug, subject_slug, topic_slug, page=1):
            f"/contents?page={page}&contentType=DppNotes&tag={topic_slug}")
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="contents")
+        data = decode_json(resp.content, CONTENTS_SPEC)
         dpp_list = []
         for entry in data.get("data", []):
             for hw in entry.get("homeworkIds", []):
@@ -155,6 +181,7 @@ def fetch_dpp(token, batch_slug, subject_slug, topic_slug, page=1):
         return []
 
 
+@traced
 def get_dpp_quiz_attempt_id(token, batch_id, subject_id, topic_id, page=1, limit=50):
     """
     Fetch the attempt ID for a DPP-Quiz for a given topic, if it exists.
@@ -165,8 +192,8 @@ def get_dpp_quiz_attempt_id(token, batch_id, subject_id, topic_id, page=1, limit
            f"&isSubjective=false&chapterId={topic_id}")
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="dpp-tests")
+        data = decode_json(resp.content, DPP_TESTS_SPEC)
         for entry in data.get("data", []):
             test_mapping = entry.get("testStudentMapping", {})
             attempt_id = test_mapping.get("_id")
@@ -176,6 +203,7 @@ def get_dpp_quiz_attempt_id(token, batch_id, subject_id, topic_id, page=1, limit
     except Exception:
         return None
 
+@traced
 def fetch_dpp_quiz_questions(token, attempt_id):
     """
     Fetch questions for an attempted DPP-Quiz using its attempt ID.
@@ -193,8 +221,8 @@ def fetch_dpp_quiz_questions(token, attempt_id):
     url = (f"{BASE_URL}/v3/test-service/tests/mapping/{attempt_id}/preview-test")
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="preview-test")
+        data = decode_json(resp.content, PREVIEW_TEST_SPEC)
         out = []
         for qwrap in data.get("data", {}).get("questions", []):
             q = qwrap.get("question", {})
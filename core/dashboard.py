@@ -1,8 +1,21 @@
 # core/dashboard.py
 
-import requests
-from core.utils import get_auth_headers, BASE_URL
+from core.http import http_get
+from core.utils import get_auth_headers, decode_json, fields, BASE_URL
+from core.profiling import traced
 
+LECTURE_STATS_FIELDS = fields("completedChapter", "completedLectures", "totalWatchTime", "totalChapters", "totalLectures")
+BATCH_LECTURE_SPEC = fields(data=LECTURE_STATS_FIELDS)
+SUBJECT_LECTURE_SPEC = fields(data=[dict(LECTURE_STATS_FIELDS, subjectId=fields("name"))])
+BATCH_QUIZ_SPEC = fields(data=[fields("key", value=fields(
+    "accuracy", "marksObtained", "correctQuestions", "completedQuiz", "totalQuiz"
+))])
+SUBJECT_QUIZ_SPEC = fields(data=[fields(
+    "accuracy", "marksObtained", "totalQuestions", "correctQuestions",
+    "attemptedQuestions", "attempted", "totalQuiz", subjectId=fields("name"),
+)])
+
+@traced
 def fetch_batch_lecture_stats(token, batch_id):
     """
     Fetch lecture statistics for a complete batch.
@@ -13,8 +26,8 @@ def fetch_batch_lecture_stats(token, batch_id):
     url = f"{BASE_URL}/v3/performance/lecture?batchId={batch_id}"
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="performance")
+        data = decode_json(resp.content, BATCH_LECTURE_SPEC)
         d = data.get("data", {})
         return {
             "completedChapter": d.get("completedChapter"),
@@ -26,6 +39,7 @@ def fetch_batch_lecture_stats(token, batch_id):
     except Exception:
         return {}
 
+@traced
 def fetch_subject_lecture_stats(token, batch_id):
     """
     Fetch lecture statistics for each subject in a batch.
@@ -38,8 +52,8 @@ def fetch_subject_lecture_stats(token, batch_id):
     url = f"{BASE_URL}/v3/performance/lecture/subjects?batchId={batch_id}"
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="performance")
+        data = decode_json(resp.content, SUBJECT_LECTURE_SPEC)
         stats = []
         for item in data.get("data", []):
             subject = item.get("subjectId", {})
@@ -55,6 +69,7 @@ def fetch_subject_lecture_stats(token, batch_id):
     except Exception:
         return []
 
+@traced
 def fetch_batch_quiz_stats(token, batch_id):
     """
     Fetch combined DPP-Quiz stats for a batch.
@@ -66,8 +81,8 @@ def fetch_batch_quiz_stats(token, batch_id):
     url = f"{BASE_URL}/v3/performance/quiz?batchId={batch_id}"
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="performance")
+        data = decode_json(resp.content, BATCH_QUIZ_SPEC)
         result = []
         for item in data.get("data", []):
             val = item.get("value", {})
@@ -83,6 +98,7 @@ def fetch_batch_quiz_stats(token, batch_id):
     except Exception:
         return []
 
+@traced
 def fetch_subject_quiz_stats(token, batch_id, quiz_type="OBJECTIVE"):
     """
     Fetch DPP-Quiz stats for each subject in a batch.
@@ -94,8 +110,8 @@ def fetch_subject_quiz_stats(token, batch_id, quiz_type="OBJECTIVE"):
     url = f"{BASE_URL}/v3/performance/quiz/subjects?batchId={batch_id}&type={quiz_type}"
     headers = get_auth_headers(token)
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        data = resp.json()
+        resp = http_get(url, headers, endpoint="performance")
+        data = decode_json(resp.content, SUBJECT_QUIZ_SPEC)
         result = []
         for item in data.get("data", []):
             subject = item.get("subjectId", {})
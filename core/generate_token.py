@@ -1,6 +1,6 @@
 # core/generate_token.py
 
-import requests
+from core.http import http_post
 from core.utils import (
     get_default_headers, BASE_URL, ORGANIZATION_ID,
     CLIENT_ID, CLIENT_SECRET, GRANT_TYPE, LATITUDE, LONGITUDE
@@ -19,7 +19,7 @@ def send_otp(phone: str, country_code: str, random_id=None):
         "organizationId": ORGANIZATION_ID
     }
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=10)
+        resp = http_post(url, json=payload, headers=headers, endpoint="get-otp")
         data = resp.json()
         if data.get("success"):
             return {"success": True}
@@ -51,7 +51,7 @@ def get_token(phone: str, otp: str, random_id=None):
         "organizationId": ORGANIZATION_ID
     }
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=10)
+        resp = http_post(url, json=payload, headers=headers, endpoint="token")
         data = resp.json()
         if data.get("success") and "data" in data:
             return {
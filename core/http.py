@@ -0,0 +1,369 @@
+# core/http.py
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core import cancel
+from core.cache import is_offline
+from core.limiter import LIMITS, PRIORITIES, current_priority, limiter_for
+from core.profiling import span
+
+# Resilience policy for idempotent GETs. Override with configure() or PW_HTTP_* env vars.
+POLICY = {
+    "timeout": float(os.environ.get("PW_HTTP_TIMEOUT", 10)),
+    "attempts": int(os.environ.get("PW_HTTP_ATTEMPTS", 3)),
+    "backoff_base": float(os.environ.get("PW_HTTP_BACKOFF_BASE", 0.5)),
+    "backoff_max": float(os.environ.get("PW_HTTP_BACKOFF_MAX", 8)),
+    "hedge_after": float(os.environ.get("PW_HTTP_HEDGE_AFTER", 2.5)),  # seconds; 0 disables hedging
+    "breaker_threshold": int(os.environ.get("PW_HTTP_BREAKER_THRESHOLD", 5)),
+    "breaker_reset": float(os.environ.get("PW_HTTP_BREAKER_RESET", 30)),
+    "stale_entries": 512,
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CHUNK_SIZE = 64 * 1024
+
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+session.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+# Requests only reach the pool holding a limiter slot, so it never queues them
+# (in_flight <= LIMITS["max"] per host)
+_hedge_pool = ThreadPoolExecutor(max_workers=2 * int(LIMITS["max"]), thread_name_prefix="pw-http")
+
+class CircuitOpenError(requests.RequestException):
+    """Raised when an endpoint's breaker is open and there is no cached response to serve."""
+
+class OfflineError(requests.ConnectionError):
+    """Raised instead of sending a request while the calling thread is in offline mode."""
+
+def configure(**overrides):
+    """Updates the resilience policy, e.g. configure(attempts=5, hedge_after=0)."""
+    unknown = set(overrides) - set(POLICY)
+    if unknown:
+        raise KeyError(f"Unknown HTTP policy keys: {', '.join(sorted(unknown))}")
+    POLICY.update(overrides)
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for one endpoint.
+    closed -> open after `breaker_threshold` failures; open -> half-open after
+    `breaker_reset` seconds, letting a single trial request through.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.trial_owner = None  # thread running the half-open trial
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= POLICY["breaker_reset"]:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                self.trial_owner = threading.get_ident()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= POLICY["breaker_threshold"]:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def abandon_trial(self):
+        """
+        Lets another request be the trial when the calling thread's trial ended
+        without an outcome (cancelled, or an unexpected error); counts no failure.
+        """
+        with self._lock:
+            if self.trial_in_flight and self.trial_owner == threading.get_ident():
+                self.trial_in_flight = False
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_last_good = OrderedDict()  # {(url, authorization): response}
+_last_good_lock = threading.Lock()
+
+def get_breaker(endpoint):
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker()
+        return _breakers[endpoint]
+
+def breaker_states():
+    """Returns {endpoint: state} for every endpoint seen so far."""
+    with _breakers_lock:
+        return {endpoint: breaker.state for endpoint, breaker in _breakers.items()}
+
+def _cache_key(url, headers):
+    return url, (headers or {}).get("Authorization")
+
+def _remember(key, resp):
+    with _last_good_lock:
+        _last_good[key] = resp
+        _last_good.move_to_end(key)
+        while len(_last_good) > POLICY["stale_entries"]:
+            _last_good.popitem(last=False)
+
+def _cached(key):
+    with _last_good_lock:
+        return _last_good.get(key)
+
+def _backoff(attempt, resp=None):
+    """Full-jitter exponential backoff, honouring Retry-After on 429/503."""
+    delay = random.uniform(0, min(POLICY["backoff_max"], POLICY["backoff_base"] * 2 ** attempt))
+    retry_after = _retry_after(resp) if resp is not None else None
+    return max(delay, retry_after or 0)
+
+def _retry_after(resp):
+    value = resp.headers.get("Retry-After")
+    return min(float(value), POLICY["backoff_max"]) if value and value.isdigit() else None
+
+def _read_body(resp):
+    """
+    Reads a streamed response body chunk by chunk, so a cancelled request stops
+    downloading and closes its connection instead of holding it until the end.
+    """
+    chunks = []
+    try:
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            cancel.check()
+            chunks.append(chunk)
+    except BaseException:
+        resp.close()
+        raise
+    # Same state requests leaves behind after reading resp.content
+    resp._content = b"".join(chunks)
+    resp._content_consumed = True
+    return resp
+
+def _send(method, url, timeout, endpoint="default", **kwargs):
+    """
+    Sends one request through the host's shared adaptive limiter. Inside a
+    cancel scope the body is streamed, so cancelling aborts the download.
+    """
+    with limiter_for(url).slot(endpoint=endpoint) as outcome:
+        return _request(outcome, method, url, timeout, **kwargs)
+
+def _request(outcome, method, url, timeout, **kwargs):
+    cancel.check()
+    stream = cancel.current() is not None
+    resp = session.request(method, url, timeout=timeout, stream=stream, **kwargs)
+    outcome["status"] = resp.status_code
+    if resp.status_code in (429, 503):
+        outcome["retry_after"] = _retry_after(resp)
+    return _read_body(resp) if stream else resp
+
+def _submit(method, url, timeout, endpoint, blocking=True, **kwargs):
+    """
+    Like _send, but returns a future: the limiter slot is taken on the calling
+    thread (in the limiter's priority queue, not the pool's FIFO one) and the
+    request then runs on _hedge_pool. With blocking=False returns None if no
+    slot is free right now.
+    """
+    stack = ExitStack()
+    outcome = stack.enter_context(limiter_for(url).slot(endpoint=endpoint, blocking=blocking))
+    if outcome is None:
+        stack.close()
+        return None
+
+    def run():
+        with stack:
+            return _request(outcome, method, url, timeout, **kwargs)
+    try:
+        return _hedge_pool.submit(cancel.inherit_scope(run))
+    except BaseException:
+        stack.close()
+        raise
+
+def http_post(url, json=None, headers=None, timeout=None, endpoint="default"):
+    """
+    Single-attempt POST (OTP, token exchange and verification are not retried)
+    that still counts against the host's shared limiter.
+    """
+    if is_offline():
+        raise OfflineError(f"Offline mode: not sending POST {url}")
+    with span("http POST"):
+        return _send("POST", url, timeout or POLICY["timeout"], endpoint, json=json, headers=headers)
+
+def _hedged_get(url, headers, timeout, endpoint, hedge=True):
+    """
+    Sends the GET and, if no answer arrives within `hedge_after` seconds and
+    the limiter has a slot free, a second identical one; returns whichever
+    completes first.
+    """
+    hedge_after = POLICY["hedge_after"]
+    if not hedge or not hedge_after or hedge_after >= timeout:
+        return _send("GET", url, timeout, endpoint, headers=headers)
+    futures = [_submit("GET", url, timeout, endpoint, headers=headers)]
+    done, _ = _wait(futures, timeout=hedge_after)
+    if not done:
+        # A hedge that has to queue for a slot would only add to the overload
+        hedge_future = _submit("GET", url, timeout, endpoint, blocking=False, headers=headers)
+        if hedge_future is not None:
+            futures.append(hedge_future)
+    error = None
+    pending = set(futures)
+    while pending:
+        done, pending = _wait(pending)
+        for future in done:
+            try:
+                return future.result()
+            except requests.RequestException as e:
+                error = e
+    raise error
+
+def _wait(futures, timeout=None):
+    """wait(..., return_when=FIRST_COMPLETED) that gives up when the caller's cancel scope is cancelled."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        remaining = None if deadline is None else max(0, deadline - time.monotonic())
+        if cancel.current() is not None:
+            remaining = cancel.POLL_INTERVAL if remaining is None else min(remaining, cancel.POLL_INTERVAL)
+        done, pending = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+        cancel.check()
+        if done or (deadline is not None and time.monotonic() >= deadline):
+            return done, pending
+
+class _Call:
+    """One in-flight request that concurrent identical callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_in_flight = {}  # {((url, authorization), priority class): _Call}
+_in_flight_lock = threading.Lock()
+
+def single_flight(key, fn):
+    """
+    Runs fn() once per key at a time: callers arriving while a call for the
+    same key is in flight wait for it and share its result (or exception).
+    If the call is cancelled by its caller's scope, waiters outside that scope
+    run it again themselves.
+    Calls run at their leader's priority class, so a caller only joins calls of
+    its own or a higher class: an interactive click never waits on a background
+    refresh queued behind other background work, while background work can
+    share an interactive call.
+    """
+    name = current_priority()
+    joinable = [(key, p) for p in PRIORITIES[:PRIORITIES.index(name) + 1]]
+    while True:
+        with _in_flight_lock:
+            call = next((_in_flight[k] for k in joinable if k in _in_flight), None)
+            leader = call is None
+            if leader:
+                call = _in_flight[(key, name)] = _Call()
+        if leader:
+            break
+        cancel.wait(call.done)
+        if isinstance(call.error, cancel.Cancelled):
+            cancel.check()
+            continue
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        call.result = fn()
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[(key, name)]
+        call.done.set()
+    return call.result
+
+def in_flight_count():
+    """Number of distinct requests currently in flight through single_flight()."""
+    with _in_flight_lock:
+        return len(_in_flight)
+
+def http_get(url, headers=None, endpoint="default", serve_stale=True, hedge=True):
+    """
+    GET through the shared resilience policy (see _resilient_get). Concurrent
+    identical requests (same URL and Authorization header) from any session
+    thread are coalesced into a single upstream call whose response they all share.
+    Raises OfflineError without touching the network in offline mode, and
+    cancel.Cancelled once the calling thread's cancel scope is cancelled.
+    """
+    if is_offline():
+        raise OfflineError(f"Offline mode: not sending GET {url}")
+    cancel.check()
+    with span(f"http GET {endpoint}"):
+        return single_flight(_cache_key(url, headers), lambda: _resilient_get(url, headers, endpoint, serve_stale, hedge))
+
+def _resilient_get(url, headers, endpoint, serve_stale, hedge):
+    """
+    GET with retries, hedging and a per-endpoint circuit breaker.
+    Retries request errors (connection resets, timeouts, ...) and RETRY_STATUSES with jittered
+    exponential backoff. While the endpoint's breaker is open, or once all
+    attempts fail, the last good response for the same URL and credentials
+    is served instead (pass serve_stale=False for large downloads that should
+    not be kept in memory). Pass hedge=False for downloads too: the hedge timer
+    covers the whole body, so a slow transfer would be sent twice. Returns a requests.Response; raises if there is nothing to serve.
+    """
+    key = _cache_key(url, headers)
+    breaker = get_breaker(endpoint)
+    if not breaker.allow():
+        cached = _cached(key)
+        if cached is not None:
+            return cached
+        raise CircuitOpenError(f"Circuit open for {endpoint}")
+
+    resp, error = None, None
+    try:
+        for attempt in range(POLICY["attempts"]):
+            if attempt:
+                cancel.sleep(_backoff(attempt - 1, resp))
+            try:
+                resp, error = _hedged_get(url, headers, POLICY["timeout"], endpoint, hedge), None
+            except requests.RequestException as e:
+                resp, error = None, e
+            if resp is None or resp.status_code in RETRY_STATUSES:
+                breaker.record_failure()
+                if breaker.state != "closed":
+                    break
+                continue
+            breaker.record_success()
+            if resp.ok and serve_stale:
+                _remember(key, resp)
+            return resp
+    finally:
+        # A trial that ends in cancel.Cancelled (or any other unexpected exception)
+        # records no outcome; without this the breaker would stay half-open for good
+        breaker.abandon_trial()
+
+    cached = _cached(key)
+    if cached is not None:
+        return cached
+    if resp is not None:
+        return resp
+    raise error
@@ -0,0 +1,246 @@
+# core/limiter.py
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from core import cancel
+
+# Defaults per upstream host. Override with PW_LIMIT_* env vars.
+LIMITS = {
+    "rate": float(os.environ.get("PW_LIMIT_RATE", 20)),            # requests per second
+    "burst": float(os.environ.get("PW_LIMIT_BURST", 40)),          # token bucket size
+    "initial": float(os.environ.get("PW_LIMIT_INITIAL", 8)),       # starting concurrency
+    "min": float(os.environ.get("PW_LIMIT_MIN", 1)),
+    "max": float(os.environ.get("PW_LIMIT_MAX", 32)),
+    "backoff": float(os.environ.get("PW_LIMIT_BACKOFF", 0.7)),     # multiplicative decrease
+    "latency_factor": float(os.environ.get("PW_LIMIT_LATENCY_FACTOR", 3)),
+}
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Request classes, in order of precedence. When both are waiting for a slot,
+# interactive requests get WEIGHTS-proportional service (4:1) so they jump the
+# queue without starving background work, and background requests never hold
+# more than BACKGROUND_SHARE of the concurrency window.
+PRIORITIES = ("interactive", "background")
+WEIGHTS = {"interactive": 4, "background": 1}
+BACKGROUND_SHARE = float(os.environ.get("PW_LIMIT_BACKGROUND_SHARE", 0.75))
+DEFAULT_PRIORITY = os.environ.get("PW_PRIORITY", "interactive")
+
+_priority = threading.local()
+
+def current_priority():
+    """Priority class of requests sent from the current thread."""
+    return getattr(_priority, "value", None) or DEFAULT_PRIORITY
+
+@contextmanager
+def priority(name):
+    """Sends requests made inside the block (on this thread) with priority class `name`."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority {name!r}; expected one of {PRIORITIES}")
+    previous = getattr(_priority, "value", None)
+    _priority.value = name
+    try:
+        yield
+    finally:
+        _priority.value = previous
+
+def inherit_priority(fn):
+    """Wraps fn so it runs with the caller's priority class, e.g. when handed to a thread pool."""
+    name = current_priority()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with priority(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+class AdaptiveLimiter:
+    """
+    Process-wide limiter for one upstream host.
+
+    A token bucket caps the request rate, and an AIMD window caps concurrency:
+    every healthy response grows the window by 1/window (about +1 per round trip),
+    while a 429/5xx, a request error or a latency spike (latency_factor times the
+    endpoint's smoothed baseline) shrinks it by `backoff`, at most once per round trip.
+    Baselines are kept per endpoint, since a tiny verify-token call and a large
+    listing on the same host have very different normal latencies, and every
+    successful response feeds them, so a lasting latency shift becomes the new
+    normal instead of shrinking the window for good.
+    A Retry-After header pauses the bucket for everyone.
+    Waiting requests are granted slots per priority class (see PRIORITIES).
+    """
+
+    def __init__(self, rate=None, burst=None, initial=None, min_limit=None, max_limit=None):
+        self._cond = threading.Condition()
+        self.rate = rate or LIMITS["rate"]
+        self.burst = burst or LIMITS["burst"]
+        self.min_limit = min_limit or LIMITS["min"]
+        self.max_limit = max_limit or LIMITS["max"]
+        self.limit = initial or LIMITS["initial"]
+        self.tokens = self.burst
+        self.in_flight = 0
+        self.in_flight_by_class = {name: 0 for name in PRIORITIES}
+        self._waiting = {name: deque() for name in PRIORITIES}
+        self._served = {name: 0.0 for name in PRIORITIES}  # weighted service, for fair sharing
+        self.baselines = {}           # {endpoint: EWMA of successful latencies, seconds}
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _eligible(self, name):
+        if name == "background":
+            return self.in_flight_by_class[name] < max(1, int(self.limit * BACKGROUND_SHARE))
+        return True
+
+    def _next_class(self):
+        """The waiting class with the least weighted service that may take a slot."""
+        candidates = [name for name in PRIORITIES if self._waiting[name] and self._eligible(name)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda name: (self._served[name], PRIORITIES.index(name)))
+
+    def acquire(self, priority_class=None, blocking=True):
+        """
+        Blocks until both a concurrency slot and a rate token are available and
+        it is this request's turn under the priority policy. Raises
+        cancel.Cancelled if the calling thread's cancel scope is cancelled meanwhile.
+        With blocking=False returns None instead of waiting.
+        """
+        name = priority_class or current_priority()
+        ticket = object()
+        cancel_scope = cancel.current()
+        unregister = cancel_scope.on_cancel(self._wake) if cancel_scope is not None else None
+        with self._cond:
+            if not self._waiting[name]:
+                # A class that was idle resumes at the current service level
+                # instead of claiming a burst for the time it was away
+                busy = [self._served[n] for n in PRIORITIES if self._waiting[n] and n != name]
+                if busy:
+                    self._served[name] = max(self._served[name], min(busy))
+            self._waiting[name].append(ticket)
+            try:
+                while True:
+                    cancel.check()
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self._paused_until:
+                        timeout = self._paused_until - now
+                    elif self.in_flight >= int(self.limit):
+                        timeout = None
+                    elif self._waiting[name][0] is not ticket or self._next_class() != name:
+                        timeout = None
+                    elif self.tokens < 1:
+                        timeout = (1 - self.tokens) / self.rate
+                    else:
+                        self.tokens -= 1
+                        self.in_flight += 1
+                        self.in_flight_by_class[name] += 1
+                        self._served[name] += 1 / WEIGHTS[name]
+                        return name
+                    if not blocking:
+                        return None
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting[name].remove(ticket)
+                self._cond.notify_all()
+                if unregister is not None:
+                    unregister()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self, latency, status=None, error=False, retry_after=None, priority_class="interactive",
+                cancelled=False, endpoint="default"):
+        """
+        Returns a slot and feeds the outcome of the request into the AIMD window.
+        A cancelled request says nothing about the API's health and only frees its slot.
+        """
+        with self._cond:
+            utilised = self.in_flight >= self.limit / 2
+            self.in_flight -= 1
+            self.in_flight_by_class[priority_class] -= 1
+            if cancelled:
+                self._cond.notify_all()
+                return
+            now = time.monotonic()
+            baseline = self.baselines.get(endpoint)
+            failed = error or status in THROTTLE_STATUSES
+            spike = baseline is not None and latency > baseline * LIMITS["latency_factor"]
+            if not failed:
+                self.baselines[endpoint] = latency if baseline is None else 0.9 * baseline + 0.1 * latency
+            if failed or spike:
+                # One decrease per round trip, so a burst of failures from the
+                # same window does not collapse the limit to the floor
+                if now - self._last_decrease > (baseline or latency):
+                    self.limit = max(self.min_limit, self.limit * LIMITS["backoff"])
+                    self._last_decrease = now
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+            elif utilised:
+                # Only grow a window that is actually being used, otherwise a
+                # rate-bound or idle period would inflate it without evidence
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority_class=None, endpoint="default", blocking=True):
+        """
+        with limiter.slot(endpoint=...) as outcome: ...; outcome["status"] = resp.status_code
+        Errors raised inside the block are recorded as failures (except cancellations).
+        Uses the calling thread's priority class unless one is given. With
+        blocking=False, outcome is None (and no slot is held) if none is free right now.
+        """
+        name = self.acquire(priority_class, blocking)
+        if name is None:
+            yield None
+            return
+        outcome = {"status": None, "retry_after": None}
+        start = time.monotonic()
+        try:
+            yield outcome
+        except cancel.Cancelled:
+            self.release(time.monotonic() - start, priority_class=name, cancelled=True, endpoint=endpoint)
+            raise
+        except BaseException:
+            self.release(time.monotonic() - start, error=True, priority_class=name, endpoint=endpoint)
+            raise
+        self.release(time.monotonic() - start, outcome["status"],
+                     retry_after=outcome["retry_after"], priority_class=name, endpoint=endpoint)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "in_flight_by_class": dict(self.in_flight_by_class),
+                "waiting": {name: len(queue) for name, queue in self._waiting.items()},
+                "tokens": round(self.tokens, 2),
+                "baseline_ms": {endpoint: round(baseline * 1000, 1) for endpoint, baseline in self.baselines.items()},
+            }
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def limiter_for(url):
+    """Returns the shared limiter for the URL's host, creating it on first use."""
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveLimiter()
+        return _limiters[host]
+
+def limiter_stats():
+    """Returns {host: stats} for every host seen so far."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {host: limiter.stats() for host, limiter in limiters.items()}
@@ -0,0 +1,157 @@
+# core/profiling.py
+
+import cProfile
+import functools
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from core.cache import DATA_DIR
+
+# Opt-in: PW_PROFILE=1 (or ?profile=1 in the dashboard URL) profiles every rerun;
+# reruns slower than PW_PROFILE_SLOW_MS get their traces written to PROFILE_DIR.
+PROFILE_ENV = os.environ.get("PW_PROFILE", "").lower() in ("1", "true", "yes")
+SLOW_MS = float(os.environ.get("PW_PROFILE_SLOW_MS", 500))
+SAMPLE_INTERVAL = float(os.environ.get("PW_PROFILE_SAMPLE_MS", 5)) / 1000
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+
+log = logging.getLogger(__name__)
+_state = threading.local()
+# Only one cProfile profiler can be active per process (3.12+ raises otherwise),
+# so concurrent profiled reruns take turns; the others get spans and samples only.
+_cprofile_lock = threading.Lock()
+_trace_ids = itertools.count(1)  # keeps concurrent reruns' trace files apart
+
+def enabled(query_flag=None):
+    """True if profiling is switched on by env var or by a ?profile=1 query parameter value."""
+    return PROFILE_ENV or str(query_flag).lower() in ("1", "true", "yes")
+
+def active():
+    """True while the current thread is inside a profiled rerun."""
+    return getattr(_state, "spans", None) is not None
+
+@contextmanager
+def span(name):
+    """Records a timing span on the current thread's trace; a no-op when not profiling."""
+    spans = getattr(_state, "spans", None)
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, start, time.perf_counter() - start))
+
+def traced(fn):
+    """Decorator: wraps each call of a core.* function in a span named module.function."""
+    name = f"{fn.__module__}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if getattr(_state, "spans", None) is None:
+            return fn(*args, **kwargs)
+        with span(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+class _Sampler(threading.Thread):
+    """Samples one thread's stack every SAMPLE_INTERVAL seconds into folded-stack counts."""
+
+    def __init__(self, target_ident):
+        super().__init__(daemon=True, name="pw-profile-sampler")
+        self.target_ident = target_ident
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.target_ident)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def _write_traces(label, duration, spans, started, profiler, sampler):
+    """
+    Writes, for one slow rerun:
+      <name>.prof        cProfile stats (snakeviz, tuna, flameprof), if this rerun held cProfile
+      <name>.folded      sampled folded stacks (flamegraph.pl, speedscope, inferno)
+      <name>.trace.json  timing spans as Chrome trace events (chrome://tracing, Perfetto, speedscope)
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{next(_trace_ids)}-{label}-{int(duration * 1000)}ms"
+    base = os.path.join(PROFILE_DIR, name)
+    if profiler is not None:
+        profiler.dump_stats(base + ".prof")
+    with open(base + ".folded", "w") as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    tid = threading.get_ident()
+    events = [{"name": label, "ph": "X", "ts": 0, "dur": duration * 1e6, "pid": os.getpid(), "tid": tid}]
+    events += [
+        {"name": span_name, "ph": "X", "ts": (start - started) * 1e6, "dur": span_duration * 1e6,
+         "pid": os.getpid(), "tid": tid}
+        for span_name, start, span_duration in spans
+    ]
+    with open(base + ".trace.json", "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return base
+
+def _start_cprofile():
+    """Returns an enabled cProfile.Profile, or None if another thread (or tool) is profiling."""
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool (sys.monitoring / sys.setprofile user) is already active
+        _cprofile_lock.release()
+        return None
+    return profiler
+
+@contextmanager
+def rerun(label, enabled=False):
+    """
+    Profiles one rerun (e.g. streamlit.main) with cProfile, a stack sampler and
+    timing spans. Traces are written only if the rerun takes longer than SLOW_MS.
+    While another session's rerun holds cProfile, only spans and samples are taken.
+    Does nothing unless `enabled`.
+    """
+    if not enabled or active():
+        yield
+        return
+    _state.spans = []
+    profiler = _start_cprofile()
+    sampler = _Sampler(threading.get_ident())
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _cprofile_lock.release()
+        duration = time.perf_counter() - started
+        sampler.stop()
+        spans, _state.spans = _state.spans, None
+        if duration * 1000 >= SLOW_MS:
+            try:
+                base = _write_traces(label, duration, spans, started, profiler, sampler)
+                log.warning("slow %s: %.0f ms, traces written to %s.*", label, duration * 1000, base)
+            except OSError:
+                log.exception("could not write profile traces")
@@ -0,0 +1,275 @@
+# core/search.py
+
+import atexit
+import bisect
+import heapq
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MIN_SCORE = 0.5
+MAX_CANDIDATES = 2000  # docs taken per query token; common tokens ("notes") would otherwise score every doc
+SAVE_DELAY = float(os.environ.get("PW_SEARCH_SAVE_DELAY", 30))  # seconds between index writes
+
+def tokenize(text):
+    """Lower-cases text and splits it into alphanumeric tokens."""
+    return TOKEN_RE.findall((text or "").lower())
+
+def trigrams(token):
+    """
+    Returns the set of trigrams for a token, left-padded so that
+    short prefixes ("ch", "che") still produce matching trigrams.
+    """
+    padded = "  " + token
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SearchIndex:
+    """
+    In-memory search index over batches, subjects, topics and attachment names.
+    Documents are dicts with at least: id, kind, title.
+    Query tokens are matched against the title vocabulary by trigram overlap,
+    so prefixes and small typos still match; only the matching vocabulary
+    tokens are then expanded to documents.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.docs = {}         # {doc_id: doc}
+        self.doc_tokens = {}   # {doc_id: frozenset(token)}
+        self.token_docs = {}   # {token: set(doc_id)}
+        self.gram_tokens = {}  # {trigram: set(token)}
+        self._ranked = {}      # {token: [doc_id]} shortest title first, built on first search
+        self.version = 0       # bumped on every change, for callers caching results
+        self._save_timer = None
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _remove(self, doc_id):
+        old = self.docs.pop(doc_id, None)
+        if old is None:
+            return
+        for token in self.doc_tokens.pop(doc_id):
+            ids = self.token_docs.get(token)
+            if ids is None:
+                continue
+            ids.discard(doc_id)
+            if token in self._ranked:
+                self._ranked[token].remove(doc_id)
+            if not ids:
+                del self.token_docs[token]
+                for gram in trigrams(token):
+                    tokens = self.gram_tokens.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self.gram_tokens[gram]
+
+    def add(self, doc):
+        """
+        Adds or replaces a single document. Safe to call from any session thread.
+        Returns False if an identical document was already indexed.
+        """
+        with self._lock:
+            if self.docs.get(doc["id"]) == doc:
+                return False
+            self._remove(doc["id"])
+            self.docs[doc["id"]] = doc
+            self.doc_tokens[doc["id"]] = frozenset(tokenize(doc.get("title")))
+            for token in self.doc_tokens[doc["id"]]:
+                if token not in self.token_docs:
+                    self.token_docs[token] = set()
+                    for gram in trigrams(token):
+                        self.gram_tokens.setdefault(gram, set()).add(token)
+                self.token_docs[token].add(doc["id"])
+                if token in self._ranked:
+                    bisect.insort(self._ranked[token], doc["id"], key=self._rank_key)
+            self.version += 1
+            return True
+
+    def add_many(self, docs):
+        """Adds documents incrementally; returns how many were new or changed."""
+        return sum(1 for doc in docs if self.add(doc))
+
+    def _match_tokens(self, query_token):
+        """Returns {vocab_token: similarity} for vocabulary tokens close to query_token."""
+        grams = trigrams(query_token)
+        hits = Counter()
+        for gram in grams:
+            hits.update(self.gram_tokens.get(gram, ()))
+        # Exact tokens outrank prefix and fuzzy matches with the same trigram overlap
+        return {
+            token: 1.0 if token == query_token else min(count / len(grams), 0.99)
+            for token, count in hits.items()
+            if count / len(grams) >= MIN_SCORE
+        }
+
+    def _rank_key(self, doc_id):
+        return len(self.docs[doc_id].get("title") or ""), doc_id
+
+    def _ranked_docs(self, token):
+        """Doc ids containing `token`, shortest title first (the ranking tie-break)."""
+        ranked = self._ranked.get(token)
+        if ranked is None:
+            ranked = self._ranked[token] = sorted(self.token_docs[token], key=self._rank_key)
+        return ranked
+
+    def _candidates(self, matches):
+        """
+        Collects docs worth scoring: query tokens with the smallest posting lists
+        go first, and each contributes at most MAX_CANDIDATES docs (best vocabulary
+        match, then shortest title, first). Once the remaining tokens could no
+        longer lift a new doc to MIN_SCORE, no new docs are added.
+        """
+        order = sorted(matches, key=lambda match: sum(len(self.token_docs[t]) for t in match))
+        candidates = set()
+        for k, match in enumerate(order):
+            if (len(order) - k) / len(order) < MIN_SCORE:
+                break
+            budget = MAX_CANDIDATES
+            for token in sorted(match, key=match.get, reverse=True):
+                for doc_id in self._ranked_docs(token)[:budget]:
+                    candidates.add(doc_id)
+                budget -= min(budget, len(self.token_docs[token]))
+                if not budget:
+                    break
+        return candidates
+
+    def search(self, query, limit=20, kinds=None):
+        """
+        Returns up to `limit` docs ranked by how well they match the query.
+        Each query token contributes its best vocabulary match in the doc,
+        so a doc must roughly match every token to reach MIN_SCORE.
+        Only a bounded set of candidates is scored (see _candidates), so common
+        tokens stay fast on large indexes.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores = Counter()
+        with self._lock:
+            matches = [self._match_tokens(query_token) for query_token in tokens]
+            candidates = self._candidates(matches)
+            for match in matches:
+                best = {}
+                for token, similarity in match.items():
+                    for doc_id in candidates & self.token_docs[token]:
+                        if similarity > best.get(doc_id, 0):
+                            best[doc_id] = similarity
+                for doc_id, similarity in best.items():
+                    scores[doc_id] += similarity / len(tokens)
+            candidates = (
+                doc_id for doc_id, score in scores.items()
+                if score >= MIN_SCORE and (not kinds or self.docs[doc_id].get("kind") in kinds)
+            )
+            ranked = heapq.nsmallest(
+                limit, candidates,
+                key=lambda d: (-scores[d], len(self.docs[d].get("title") or "")),
+            )
+            return [dict(self.docs[doc_id], score=round(scores[doc_id], 3)) for doc_id in ranked]
+
+    def save(self, filepath):
+        """Writes the documents to disk; postings are rebuilt on load."""
+        with self._lock:
+            docs = list(self.docs.values())
+        tmp = f"{filepath}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(docs, f)
+        os.replace(tmp, filepath)
+
+    def save_later(self, filepath, delay=SAVE_DELAY):
+        """
+        Schedules save() on a background timer, so a burst of changes costs one
+        write per `delay` seconds instead of one per change. Pending changes are
+        also written at interpreter exit.
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(delay, self._save_pending, args=(filepath,))
+            self._save_timer.daemon = True
+            self._save_timer.start()
+        atexit.register(self._save_pending, filepath)
+
+    def _save_pending(self, filepath):
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        atexit.unregister(self._save_pending)
+        self.save(filepath)
+
+    @classmethod
+    def load(cls, filepath):
+        """Loads an index saved with save(); returns an empty index if missing or corrupt."""
+        index = cls()
+        try:
+            with open(filepath, "r") as f:
+                index.add_many(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        return index
+
+def tree_documents(all_data):
+    """
+    Builds search docs from the (possibly partial) batch tree:
+    {batch_id: {'batch':{}, 'subjects':{subject_id:{'subject':{}, 'topics':{topic_id:topic}}}}}
+    """
+    docs = []
+    for batch_id, batch_entry in all_data.items():
+        batch_name = batch_entry["batch"].get("name") or batch_id
+        docs.append({
+            "id": f"batch:{batch_id}",
+            "kind": "batch",
+            "title": batch_name,
+            "path": batch_name,
+            "batch_id": batch_id,
+        })
+        for subject_id, subj_entry in batch_entry.get("subjects", {}).items():
+            subject_name = subj_entry["subject"].get("subject") or subject_id
+            docs.append({
+                "id": f"subject:{batch_id}:{subject_id}",
+                "kind": "subject",
+                "title": subject_name,
+                "path": f"{batch_name} / {subject_name}",
+                "batch_id": batch_id,
+                "subject_id": subject_id,
+            })
+            for topic_id, topic in subj_entry.get("topics", {}).items():
+                topic_name = topic.get("name") or topic_id
+                docs.append({
+                    "id": f"topic:{batch_id}:{subject_id}:{topic_id}",
+                    "kind": "topic",
+                    "title": topic_name,
+                    "path": f"{batch_name} / {subject_name} / {topic_name}",
+                    "batch_id": batch_id,
+                    "subject_id": subject_id,
+                    "topic_id": topic_id,
+                })
+    return docs
+
+def listing_documents(entries, content_type, path, batch_id, subject_id, topic_id):
+    """
+    Builds search docs for the attachments of a fetch_notes/fetch_dpp listing.
+    `path` is the human-readable batch / subject / topic location.
+    """
+    docs = []
+    for entry in entries:
+        for att in entry.get("attachments", []):
+            name = att.get("name") or entry.get("topic") or "Untitled"
+            url = (att.get("baseUrl") or "").rstrip("/") + "/" + (att.get("key") or "").lstrip("/")
+            docs.append({
+                "id": f"file:{att.get('_id') or url}",
+                "kind": content_type,
+                "title": name,
+                "path": path,
+                "url": url,
+                "batch_id": batch_id,
+                "subject_id": subject_id,
+                "topic_id": topic_id,
+            })
+    return docs
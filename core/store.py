@@ -0,0 +1,174 @@
+# core/store.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import cache
+from core.content import fetch_batches, fetch_subjects, fetch_topics, fetch_notes, fetch_dpp
+from core.dashboard import (
+    fetch_batch_lecture_stats, fetch_subject_lecture_stats,
+    fetch_batch_quiz_stats, fetch_subject_quiz_stats
+)
+from core.limiter import priority
+from core.profiling import traced
+from core.search import listing_documents
+
+# Cached views shared by the dashboard and the headless refresher (refresher.py).
+# The refresher keeps these entries fresh; the dashboard reads them and only
+# falls back to the API for entries that have never been fetched.
+
+LISTING_FETCHERS = {"notes": fetch_notes, "dpp": fetch_dpp}
+
+def _node_id(item):
+    return item.get('_id') or item.get('id') or item.get('slug')
+
+def _batch_list(batches_raw):
+    if isinstance(batches_raw, dict) and "batches" in batches_raw:
+        return batches_raw["batches"]
+    if isinstance(batches_raw, list):
+        return batches_raw
+    return []
+
+def _level_entry(key, loader, fetch=True, max_age=None, refresh=False):
+    """One cached level of the tree; with fetch=False only what is already cached is returned."""
+    if not fetch:
+        with cache.offline_mode():
+            return cache.cached_entry(key, loader, default=[])
+    return cache.cached_entry(key, loader, max_age=max_age, refresh=refresh,
+                              stale_after=cache.STALE_AFTER, default=[])
+
+@traced
+def batches_entry(token, fetch=True, max_age=None, refresh=False):
+    """Cached list of purchased batches, refreshed in the background when stale."""
+    return _level_entry(("batches", cache.token_scope(token)), lambda: _batch_list(fetch_batches(token)),
+                        fetch, max_age, refresh)
+
+@traced
+def subjects_entry(token, batch_slug, fetch=True, max_age=None, refresh=False):
+    return _level_entry(("subjects", cache.token_scope(token), batch_slug),
+                        lambda: fetch_subjects(token, batch_slug), fetch, max_age, refresh)
+
+@traced
+def topics_entry(token, batch_slug, subject_slug, fetch=True, max_age=None, refresh=False):
+    return _level_entry(("topics", cache.token_scope(token), batch_slug, subject_slug),
+                        lambda: fetch_topics(token, batch_slug, subject_slug), fetch, max_age, refresh)
+
+def expand_subject(tree, token, batch_id, subject_id, fetch=True, max_age=None, refresh=False):
+    """Fills in the topics of one subject of `tree` (see build_tree) and returns them."""
+    batch_slug = tree[batch_id]['batch'].get('slug')
+    node = tree[batch_id]['subjects'][subject_id]
+    topics = topics_entry(token, batch_slug, node['subject'].get('slug'), fetch, max_age, refresh)["value"]
+    node['topics'] = {_node_id(topic): topic for topic in topics}
+    return node['topics']
+
+def expand_batch(tree, token, batch_id, fetch=True, fetch_topics=True, max_age=None, refresh=False):
+    """
+    Fills in the subjects of one batch of `tree` and returns them. Topics are
+    fetched as well when fetch_topics=True; otherwise only cached topics are added.
+    """
+    batch_slug = tree[batch_id]['batch'].get('slug')
+    subjects = subjects_entry(token, batch_slug, fetch, max_age, refresh)["value"]
+    tree[batch_id]['subjects'] = {_node_id(subj): {'subject': subj, 'topics': {}} for subj in subjects}
+    for subject_id in tree[batch_id]['subjects']:
+        expand_subject(tree, token, batch_id, subject_id, fetch and fetch_topics, max_age, refresh)
+    return tree[batch_id]['subjects']
+
+@traced
+def build_tree(token, fetch=True, max_age=None, refresh=False):
+    """
+    Builds the batch tree from the per-level caches (batches, subjects, topics).
+    Returns {batch_id: {'batch':{}, 'subjects':{subject_id:{'subject':{}, 'topics':{topic_id:topic}}}}}
+    With fetch=False only the batch list may be fetched; subjects and topics that
+    are not cached yet stay empty until expand_batch/expand_subject loads them.
+    """
+    batches = batches_entry(token, max_age=max_age, refresh=refresh)["value"]
+    result = {_node_id(batch): {'batch': batch, 'subjects': {}} for batch in batches}
+    for batch_id in result:
+        expand_batch(result, token, batch_id, fetch, max_age=max_age, refresh=refresh)
+    return result
+
+@traced
+def load_tree(token, max_age=None, refresh=False):
+    """The complete tree, fetching every level that is missing (or older than max_age)."""
+    return build_tree(token, max_age=max_age, refresh=refresh)
+
+def has_batches(token):
+    """True if a non-empty batch list for this token has been cached."""
+    entry = cache.read(("batches", cache.token_scope(token)))
+    return entry is not None and bool(entry["value"])
+
+_warming = set()
+_warming_lock = threading.Lock()
+_warm_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pw-tree-warm")
+
+def warm_tree(token, on_tree=None):
+    """
+    Fetches every subject and topic level that is not cached yet, at background
+    priority, so later selections and search find them locally, then calls
+    on_tree(tree). In offline mode only the cache is read. At most one warm-up
+    runs per token.
+    """
+    offline = cache.is_offline()
+    scope = cache.token_scope(token)
+    with _warming_lock:
+        if scope in _warming:
+            return
+        _warming.add(scope)
+
+    def run():
+        try:
+            with priority("background"), cache.offline_mode(offline):
+                tree = build_tree(token, fetch=not offline)
+            if on_tree is not None:
+                on_tree(tree)
+        finally:
+            with _warming_lock:
+                _warming.discard(scope)
+    _warm_pool.submit(run)
+
+@traced
+def load_listing(token, content_type, batch_slug, subject_slug, topic_slug, max_age=None, refresh=False):
+    """Cached fetch_notes/fetch_dpp listing; content_type is "notes" or "dpp"."""
+    key = (content_type, cache.token_scope(token), batch_slug, subject_slug, topic_slug)
+    fetcher = LISTING_FETCHERS[content_type]
+    return cache.cached(key, lambda: fetcher(token, batch_slug, subject_slug, topic_slug),
+                        max_age=max_age, refresh=refresh)
+
+@traced
+def listing_entry(token, content_type, batch_slug, subject_slug, topic_slug, stale_after=cache.STALE_AFTER):
+    """Local-first listing: the cached entry, refreshed in the background when stale."""
+    key = (content_type, cache.token_scope(token), batch_slug, subject_slug, topic_slug)
+    fetcher = LISTING_FETCHERS[content_type]
+    return cache.cached_entry(key, lambda: fetcher(token, batch_slug, subject_slug, topic_slug),
+                              stale_after=stale_after, default=[])
+
+def cached_listing_documents(token, tree):
+    """Search docs for every Notes/DPP listing of `tree` that is cached (by the dashboard or the refresher)."""
+    scope = cache.token_scope(token)
+    docs = []
+    for batch_id, batch_entry in tree.items():
+        batch = batch_entry["batch"]
+        for subject_id, subj_entry in batch_entry["subjects"].items():
+            subject = subj_entry["subject"]
+            for topic_id, topic in subj_entry["topics"].items():
+                path = f"{batch.get('name', batch_id)} / {subject.get('subject', subject_id)} / {topic.get('name')}"
+                for content_type in LISTING_FETCHERS:
+                    entry = cache.read((content_type, scope, batch.get('slug'), subject.get('slug'), topic.get('slug')))
+                    if entry and entry["value"]:
+                        docs += listing_documents(entry["value"], content_type, path, batch_id, subject_id, topic_id)
+    return docs
+
+@traced
+def build_stats(token, batch_id):
+    return {
+        "batch_lectures": fetch_batch_lecture_stats(token, batch_id),
+        "subject_lectures": fetch_subject_lecture_stats(token, batch_id),
+        "batch_quiz": fetch_batch_quiz_stats(token, batch_id),
+        "subject_quiz": fetch_subject_quiz_stats(token, batch_id),
+    }
+
+@traced
+def load_stats(token, batch_id, max_age=None, refresh=False):
+    """Cached lecture and DPP-Quiz stats for a batch (see core.dashboard)."""
+    return cache.cached(("stats", cache.token_scope(token), batch_id), lambda: build_stats(token, batch_id),
+                        max_age=max_age, refresh=refresh)
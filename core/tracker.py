@@ -23,3 +23,16 @@ def get_new_announcements(fetched_announcements: List[Dict], known_ids: Set[str]
 def update_known_ids(fetched_announcements: List[Dict], known_ids: Set[str]) -> Set[str]:
     """Update the set of known IDs with IDs from the latest fetch."""
     return known_ids.union({ann["_id"] for ann in fetched_announcements})
+
+def load_high_waters(filepath: str) -> Dict[str, Dict]:
+    """Load per-batch announcement high-water marks ({batch_id: {_id, scheduleTime}}) from a file."""
+    try:
+        with open(filepath, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_high_waters(high_waters: Dict[str, Dict], filepath: str):
+    """Save per-batch announcement high-water marks to a file."""
+    with open(filepath, "w") as f:
+        json.dump(high_waters, f)
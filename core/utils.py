@@ -1,8 +1,17 @@
+import json
+import os
 import uuid
-import requests
 import time
 
-BASE_URL = "https://api.penpencil.co"
+from core.http import http_post
+from core.profiling import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BASE_URL = os.environ.get("PW_BASE_URL", "https://api.penpencil.co")
 ORGANIZATION_ID = "5eb393ee95fab7468a79d189"
 REFERER = "https://www.pw.live/"
 CONTENT_TYPE = "application/json"
@@ -32,7 +41,7 @@ def verify_token(token):
     url = f"{BASE_URL}/v3/oauth/verify-token"
     headers = get_auth_headers(token)
     try:
-        resp = requests.post(url, headers=headers, timeout=10)
+        resp = http_post(url, headers=headers, endpoint="verify-token")
         data = resp.json()
         if data.get("success") and data.get("data", {}).get("isVerified"):
             return {"success": True}
@@ -55,3 +64,36 @@ def get_token_expiry_info(expires_in):
         "is_expired": is_expired,
         "days_remaining": days_remaining if not is_expired else 0
     }
+
+def fields(*names, **nested):
+    """
+    Builds a projection spec: fields("name", "slug", teacherIds=[fields("email")]).
+    Plain names keep the value verbatim (use for scalars and lists of scalars),
+    keyword fields are projected recursively; a one-item list projects every element.
+    """
+    spec = {name: True for name in names}
+    spec.update(nested)
+    return spec
+
+def project(value, spec):
+    """Returns a copy of decoded JSON `value` keeping only the fields declared in `spec`."""
+    if spec is True:
+        return value
+    if isinstance(spec, list):
+        spec = spec[0]
+    if isinstance(value, list):
+        return [project(item, spec) for item in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], sub) for key, sub in spec.items() if key in value}
+    return value
+
+def decode_json(content, spec=None):
+    """
+    Decodes a JSON response body, optionally projected down to `spec`.
+    Uses orjson (see requirements.txt), or the stdlib json module when it is not installed.
+    """
+    with span("json decode"):
+        data = orjson.loads(content) if orjson is not None else json.loads(content)
+        if spec is None:
+            return data
+        return project(data, spec)
@@ -0,0 +1,88 @@
+"""
+Headless cache refresher for the dashboard.
+
+Keeps the batch tree, every topic's Notes/DPP listings and the batch stats
+fresh in the shared on-disk cache (data/cache), so the Streamlit UI only reads
+local files. Upstream traffic is bounded by this process's request budget,
+not by how many users have the dashboard open.
+
+Usage: python refresher.py [--once] [--interval SECONDS] [--rate REQUESTS_PER_SECOND]
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core import limiter
+from core.cache import DATA_DIR
+from core.store import load_tree, load_listing, load_stats, LISTING_FETCHERS
+
+TOKEN_FILE = os.path.join(DATA_DIR, "token.txt")
+REFRESH_INTERVAL = float(os.environ.get("PW_REFRESH_INTERVAL", 900))
+REFRESH_RATE = float(os.environ.get("PW_REFRESH_RATE", 5))
+
+log = logging.getLogger("refresher")
+
+def load_token():
+    if os.path.exists(TOKEN_FILE):
+        with open(TOKEN_FILE) as f:
+            return f.read().strip()
+    return None
+
+def refresh_once(token, interval):
+    """
+    Runs one refresh cycle. Entries fetched less than `interval` seconds ago
+    are skipped, so restarting the refresher does not refetch everything.
+    Returns the number of entries visited.
+    """
+    visited = 0
+    tree = load_tree(token, refresh=True)
+    visited += 1
+    for batch_id, batch_entry in tree.items():
+        load_stats(token, batch_id, max_age=interval)
+        visited += 1
+        batch_slug = batch_entry["batch"].get("slug")
+        for subj_entry in batch_entry["subjects"].values():
+            subject_slug = subj_entry["subject"].get("slug")
+            for topic in subj_entry["topics"].values():
+                for content_type in LISTING_FETCHERS:
+                    load_listing(token, content_type, batch_slug, subject_slug, topic.get("slug"), max_age=interval)
+                    visited += 1
+    return visited
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the dashboard's on-disk cache fresh.")
+    parser.add_argument("--once", action="store_true", help="run a single refresh cycle and exit")
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL,
+                        help="seconds between refresh cycles (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=REFRESH_RATE,
+                        help="upstream request budget per second (default: %(default)s)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    # The limiter is per process, so this caps the refresher's share of the API
+    limiter.LIMITS["rate"] = args.rate
+    limiter.LIMITS["burst"] = max(1, args.rate)
+
+    while True:
+        token = load_token()
+        started = time.monotonic()
+        if token:
+            try:
+                visited = refresh_once(token, args.interval)
+                log.info("refreshed %d entries in %.1fs", visited, time.monotonic() - started)
+            except Exception:
+                log.exception("refresh cycle failed")
+        else:
+            log.info("no token in %s yet; waiting for a dashboard login", TOKEN_FILE)
+        if args.once:
+            return
+        time.sleep(max(0, args.interval - (time.monotonic() - started)))
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,25 @@
 import os
-import streamlit 
+import streamlit as st
 from core.generate_token import send_otp, get_token
 from core.utils import verify_token
-from core.content import fetch_batches, fetch_subjects, fetch_topics, fetch_notes, fetch_dpp
+from core.store import (batches_entry, build_tree, expand_batch, expand_subject, has_batches, warm_tree, listing_entry,
+                        cached_listing_documents)
+from core import cache, cancel
+from core.http import http_get
+from core.archive import build_zip
+from core import profiling
+from core.search import SearchIndex, tree_documents, listing_documents
 from dotenv import load_dotenv
-import zipfile
+import functools
 import io
-import requests
+import time
 
 # --- Constants ---
-DATA_DIR = "data"
+DATA_DIR = os.environ.get("PW_DATA_DIR", "data")
 TOKEN_FILE = os.path.join(DATA_DIR, "token.txt")
+SEARCH_INDEX_FILE = os.path.join(DATA_DIR, "search_index.json")
+CONTENT_TABS = ["Notes", "DPP", "DPP-Quiz", "Announcements"]
+VERIFY_TTL = 300  # seconds a successful token verification is trusted per session
 os.makedirs(DATA_DIR, exist_ok=True)
 load_dotenv()
 
@@ -29,60 +38,201 @@ def delete_token():
         os.remove(TOKEN_FILE)
 
 def check_token(token):
-    if token:
-        res = verify_token(token)
-        return res.get("success", False)
+    """
+    Verifies the token at most once per VERIFY_TTL per session. When the API is
+    unreachable (or in offline mode) a token with cached data is accepted, so
+    the dashboard keeps working from the local cache through outages.
+    """
+    if not token:
+        return False
+    verified = st.session_state.get("verified")
+    if verified and verified[0] == token and time.time() - verified[1] < VERIFY_TTL:
+        return True
+    res = verify_token(token)
+    if res.get("success") or (res.get("error_status") is None and has_batches(token)):
+        st.session_state["verified"] = (token, time.time())
+        return True
     return False
 
+def format_age(seconds):
+    if seconds < 90:
+        return "just now"
+    if seconds < 90 * 60:
+        return f"{int(seconds // 60)} min ago"
+    if seconds < 36 * 3600:
+        return f"{int(seconds // 3600)} h ago"
+    return f"{int(seconds // 86400)} days ago"
+
+def render_staleness(entry, what):
+    """Staleness marker for a cached entry from core.store (see cache.cached_entry)."""
+    if entry["fetched_at"] is None:
+        return
+    note = f"{what} cached {format_age(time.time() - entry['fetched_at'])}"
+    if cache.is_offline():
+        st.caption(f"{note} · offline")
+    elif entry["stale"]:
+        st.caption(f"{note} · refreshing in the background")
+
+def download_attachment(url):
+    """Attachment bytes, or None if it could not be downloaded."""
+    try:
+        resp = http_get(url, endpoint="attachments", serve_stale=False, hedge=False)
+        return resp.content if resp.ok else None
+    except Exception:
+        return None
+
+@profiling.traced
 def zip_files(file_dict):
-    mem_zip = io.BytesIO()
-    with zipfile.ZipFile(mem_zip, 'w') as zf:
-        for filename, url in file_dict.items():
-            try:
-                resp = requests.get(url)
-                if resp.ok:
-                    zf.writestr(filename, resp.content)
-            except Exception:
-                continue
-    mem_zip.seek(0)
-    return mem_zip
-
-# -- Prefetch batches/subjects/topics all-at-once on login --
-@st.cache_data(show_spinner=False)
-def prefetch_all_batches_subjects_topics(token):
-    batches_raw = fetch_batches(token)
-    batches_list = []
-    if isinstance(batches_raw, dict) and "batches" in batches_raw:
-        batches_list = batches_raw["batches"]
-    elif isinstance(batches_raw, list):
-        batches_list = batches_raw
-
-    result = {}  # {batch_id: {'batch':{}, 'subjects':{subject_id:{'subject':{}, 'topics':{topic_id:topic}}}}}
-    for batch in batches_list:
-        batch_id = batch.get('_id') or batch.get('id') or batch.get('slug')
-        batch_slug = batch.get('slug')
-        subjects = fetch_subjects(token, batch_slug)
-        subj_dict = {}
-        for subj in subjects:
-            subject_id = subj.get('_id') or subj.get('id') or subj.get('slug')
-            subj_slug = subj.get('slug')
-            topics = fetch_topics(token, batch_slug, subj_slug)
-            topic_dict = {}
-            for topic in topics:
-                topic_id = topic.get('_id') or topic.get('id') or topic.get('slug')
-                topic_dict[topic_id] = topic
-            subj_dict[subject_id] = {
-                'subject': subj,
-                'topics': topic_dict
-            }
-        result[batch_id] = {
-            'batch': batch,
-            'subjects': subj_dict
-        }
-    return result
+    """Downloads and compresses the files in parallel (see core.archive); skips failed downloads."""
+    loaders = {filename: functools.partial(download_attachment, url) for filename, url in file_dict.items()}
+    return io.BytesIO(build_zip(loaders))
+
+def attachment_rows(entries):
+    """
+    Flattens fetch_notes/fetch_dpp entries into table rows.
+    Returns a list of dicts: name, topic, url (newest entries first).
+    """
+    rows = []
+    for entry in reversed(entries):
+        topic_display = entry.get("topic") or "Untitled"
+        for att in entry.get("attachments", []):
+            filename = att.get("name") or f"{topic_display}.pdf"
+            url = (att.get("baseUrl") or "").rstrip("/") + "/" + (att.get("key") or "").lstrip("/")
+            rows.append({"name": filename, "topic": topic_display, "url": url})
+    return rows
+
+@profiling.traced
+def render_attachment_table(entries, label, topic_name, key, suffix):
+    """
+    Renders attachments as one selectable table; actions apply to the selected rows.
+    Files are only downloaded when the user asks for them, so a rerun costs the same
+    regardless of how many attachments the chapter has.
+    """
+    rows = attachment_rows(entries)
+    event = st.dataframe(
+        {
+            "Name": [r["name"] for r in rows],
+            "Topic": [r["topic"] for r in rows],
+            "View": [r["url"] for r in rows],
+        },
+        column_config={
+            "Name": st.column_config.TextColumn("Name", width="large"),
+            "View": st.column_config.LinkColumn("View", display_text="Link"),
+        },
+        hide_index=True,
+        width="stretch",
+        on_select="rerun",
+        selection_mode="multi-row",
+        key=key,
+    )
+    selected = [rows[i] for i in event.selection.rows]
+
+    file_dict = {r["name"]: r["url"] for r in (selected or rows)}
+    if selected:
+        st.caption(f"{len(selected)} of {len(rows)} selected")
+        if len(selected) == 1:
+            # Like the ZIP path, fetch only on request, not on every rerun while the row stays selected
+            row = selected[0]
+            if st.button(f"Download {row['name']}", key=f"{key}-file"):
+                data = download_attachment(row["url"])
+                if data is None:
+                    st.write("Unavailable")
+                else:
+                    st.download_button(f"Save {row['name']}", data,
+                                       file_name=row["name"], mime="application/pdf")
+        elif st.button(f"Download Selected {label} as ZIP", key=f"{key}-zip"):
+            mem_zip = zip_files(file_dict)
+            st.download_button(f"Download Selected {label}", mem_zip,
+                               file_name=f"{topic_name}_{suffix}_selected.zip")
+    elif st.button(f"Download All {label} as ZIP", key=f"{key}-zip"):
+        mem_zip = zip_files(file_dict)
+        st.download_button(f"Download All {label}", mem_zip, file_name=f"{topic_name}_{suffix}.zip")
+
+# -- Search index shared by all sessions, persisted in DATA_DIR --
+@st.cache_resource(show_spinner=False)
+def get_search_index():
+    return SearchIndex.load(SEARCH_INDEX_FILE)
+
+def index_documents(docs):
+    index = get_search_index()
+    if index.add_many(docs):
+        index.save_later(SEARCH_INDEX_FILE)
+
+def clamp_selection(key, size):
+    """Resets a selectbox index that no longer fits its (changed) option list."""
+    if st.session_state.get(key, 0) >= size:
+        st.session_state[key] = 0
+
+def jump_to(doc, all_data):
+    """Points the batch/subject/topic selectors (and tab) at a search result."""
+    batch_entry = all_data.get(doc.get("batch_id"))
+    if batch_entry is None:
+        return
+    st.session_state["batch_idx"] = list(all_data).index(doc["batch_id"])
+    st.session_state["subject_idx"] = st.session_state["topic_idx"] = 0
+    subjects = batch_entry["subjects"]
+    if doc.get("subject_id") in subjects:
+        st.session_state["subject_idx"] = list(subjects).index(doc["subject_id"])
+        topics = subjects[doc["subject_id"]]["topics"]
+        if doc.get("topic_id") in topics:
+            st.session_state["topic_idx"] = list(topics).index(doc["topic_id"])
+    if doc.get("kind") == "notes":
+        st.session_state["content_tab"] = "Notes"
+    elif doc.get("kind") == "dpp":
+        st.session_state["content_tab"] = "DPP"
+
+def render_search(all_data):
+    query = st.text_input("Search batches, subjects, chapters and files", key="search_query")
+    if not query.strip():
+        return
+    # Reruns keep the query in the box; search again only when it or the index changed
+    index = get_search_index()
+    key = (query, index.version)
+    if st.session_state.get("search_key") != key:
+        st.session_state["search_key"] = key
+        st.session_state["search_hits"] = index.search(query, limit=50)
+    # The index is shared across sessions; only show this user's batches
+    results = [doc for doc in st.session_state["search_hits"] if doc.get("batch_id") in all_data][:10]
+    if not results:
+        st.caption("No matches.")
+        return
+    for i, doc in enumerate(results):
+        cols = st.columns([7, 1, 1])
+        cols[0].write(f"**{doc['title']}** · {doc['kind']} · {doc.get('path', '')}")
+        if doc.get("url"):
+            cols[1].markdown(f'[Link]({doc["url"]})')
+        cols[2].button("Go", key=f"search-go-{i}", on_click=jump_to, args=(doc, all_data))
+
+# -- Batch/subject/topic tree, loaded level by level from the shared cache (see refresher.py) --
+@st.cache_data(show_spinner=False, ttl=30)
+def load_batch_tree(token, offline=False):
+    """
+    The batch list (one round trip on first login) plus whatever subjects and
+    chapters are cached already; the selectors load the rest on demand.
+    """
+    return batches_entry(token), build_tree(token, fetch=False)
 
 def main():
     st.set_page_config("PW Batch Dashboard", layout="wide")
+    offline = st.sidebar.toggle(
+        "Offline mode", value=cache.OFFLINE, key="offline",
+        help="Serve everything from the local cache without contacting the API."
+    )
+    # Every rerun is a new navigation: abandon what the previous rerun of this
+    # session still has in flight (with fastReruns it keeps running otherwise)
+    navigation = cancel.CancelScope()
+    previous = st.session_state.get("navigation")
+    st.session_state["navigation"] = navigation
+    if previous is not None:
+        previous.cancel()
+    with cache.offline_mode(offline), cancel.scope(navigation):
+        try:
+            dashboard()
+        except cancel.Cancelled:
+            # A newer rerun of this session has taken over; its output replaces ours
+            return
+
+def dashboard():
     token = load_token()
     if 'otp_sent' not in st.session_state:
         st.session_state["otp_sent"] = False
@@ -141,15 +291,32 @@ def main():
 
         return
 
-    # ---- PREFETCH ALL BATCH/SUBJECT/TOPIC TREE (ONCE) ----
-    if 'all_batches' not in st.session_state:
-        with st.spinner("Loading your batches, subjects and chapters..."):
-            st.session_state['all_batches'] = prefetch_all_batches_subjects_topics(token)
+    # ---- BATCH TREE: BATCHES NOW, SUBJECTS/CHAPTERS ON DEMAND ----
+    with st.spinner("Loading your batches..."):
+        batches, all_data = load_batch_tree(token, cache.is_offline())
+    if all_data and 'tree_warmed' not in st.session_state:
+        # Fill in the levels nobody has opened yet, so later selections and search are local,
+        # then index the whole tree and every cached listing (e.g. from refresher.py)
+        index = get_search_index()
+
+        def index_tree(tree):
+            if index.add_many(tree_documents(tree) + cached_listing_documents(token, tree)):
+                index.save_later(SEARCH_INDEX_FILE)
+        warm_tree(token, on_tree=index_tree)
+        st.session_state['tree_warmed'] = True
 
-    all_data = st.session_state.get('all_batches', {})
+    docs = tree_documents(all_data)
+    if st.session_state.get('search_indexed') != len(docs):
+        index_documents(docs)
+        st.session_state['search_indexed'] = len(docs)
 
     if not all_data or len(all_data) == 0:
-        st.warning("No batches or data found for your user.")
+        if cache.is_offline():
+            st.warning("No cached batches available offline yet. Turn off offline mode to load them.")
+        else:
+            # Errors come back as an empty list; retry on the next rerun instead of in 30 s
+            load_batch_tree.clear()
+            st.warning("No batches or data found for your user.")
         if st.button("Logout"):
             delete_token()
             st.session_state.clear()
@@ -159,6 +326,8 @@ def main():
     # ---- MAIN DASHBOARD ----
     st.button("Logout", on_click=lambda: (delete_token(), st.session_state.clear(), st.rerun()), key="logout-btn")
     st.title("PW Study Material Dashboard")
+    render_staleness(batches, "Batches")
+    render_search(all_data)
 
     # BATCH SELECTOR:
     batch_id_to_name = {bid: all_data[bid]['batch'].get('name', bid) for bid in all_data}
@@ -167,33 +336,44 @@ def main():
     if not batch_ids:
         st.warning("No batches found for your account.")
         return
-    selected_batch_idx = st.selectbox("Select Batch", range(len(batch_names)), format_func=lambda i: batch_names[i])
+    clamp_selection("batch_idx", len(batch_ids))
+    selected_batch_idx = st.selectbox("Select Batch", range(len(batch_names)), format_func=lambda i: batch_names[i], key="batch_idx")
     sel_batch_id = batch_ids[selected_batch_idx]
     sel_batch = all_data[sel_batch_id]['batch']
     sel_batch_slug = sel_batch.get('slug')
 
     # SUBJECT SELECTOR:
     subjects_dict = all_data[sel_batch_id]['subjects']
+    if not subjects_dict:
+        with st.spinner("Loading subjects..."):
+            subjects_dict = expand_batch(all_data, token, sel_batch_id, fetch_topics=False)
     subject_id_to_name = {sid: subjects_dict[sid]['subject'].get('subject', sid) for sid in subjects_dict}
     subject_ids = list(subject_id_to_name.keys())
     subject_names = [subject_id_to_name[sid] for sid in subject_ids]
     if not subject_ids:
-        st.warning("No subjects found for the selected batch.")
+        st.warning("Subjects for this batch are not available offline." if cache.is_offline()
+                   else "No subjects found for the selected batch.")
         return
-    selected_subject_idx = st.selectbox("Select Subject", range(len(subject_names)), format_func=lambda i: subject_names[i])
+    clamp_selection("subject_idx", len(subject_ids))
+    selected_subject_idx = st.selectbox("Select Subject", range(len(subject_names)), format_func=lambda i: subject_names[i], key="subject_idx")
     sel_subject_id = subject_ids[selected_subject_idx]
     sel_subject = subjects_dict[sel_subject_id]['subject']
     sel_subject_slug = sel_subject.get('slug')
 
     # TOPIC SELECTOR:
     topics_dict = subjects_dict[sel_subject_id]['topics']
+    if not topics_dict:
+        with st.spinner("Loading chapters..."):
+            topics_dict = expand_subject(all_data, token, sel_batch_id, sel_subject_id)
     topic_id_to_name = {tid: topics_dict[tid].get('name', tid) for tid in topics_dict}
     topic_ids = list(topic_id_to_name.keys())
     topic_names = [topic_id_to_name[tid] for tid in topic_ids]
     if not topic_ids:
-        st.info("No topics for this subject.")
+        st.info("Chapters for this subject are not available offline." if cache.is_offline()
+                else "No topics for this subject.")
         return
-    selected_topic_idx = st.selectbox("Select Topic/Chapter", range(len(topic_names)), format_func=lambda i: topic_names[i])
+    clamp_selection("topic_idx", len(topic_ids))
+    selected_topic_idx = st.selectbox("Select Topic/Chapter", range(len(topic_names)), format_func=lambda i: topic_names[i], key="topic_idx")
     sel_topic_id = topic_ids[selected_topic_idx]
     sel_topic = topics_dict[sel_topic_id]
     sel_topic_slug = sel_topic.get('slug')
@@ -202,77 +382,37 @@ def main():
     # RADIO SELECTOR FOR CONTENT TYPE:
     tab = st.radio(
         "Select Content Type",
-        ["Notes", "DPP", "DPP-Quiz", "Announcements"],
-        horizontal=True
+        CONTENT_TABS,
+        horizontal=True,
+        key="content_tab"
     )
-
-    file_dict = dict()
+    topic_path = f"{batch_id_to_name[sel_batch_id]} / {subject_id_to_name[sel_subject_id]} / {topic_name}"
 
     # --- NOTES TAB ---
     if tab == "Notes":
-        notes = fetch_notes(token, sel_batch_slug, sel_subject_slug, sel_topic_slug)
+        notes_entry = listing_entry(token, "notes", sel_batch_slug, sel_subject_slug, sel_topic_slug)
+        notes = notes_entry["value"]
         st.subheader(f"Notes for Topic: {topic_name}")
+        render_staleness(notes_entry, "Notes")
         if notes:
-            col1, col2, col3 = st.columns([7, 1, 1])
-            col1.write("Name")
-            col2.write("View")
-            col3.write("Download")
-            for entry in reversed(notes):
-                topic_display = entry.get("topic") or "Untitled"
-                for att in entry.get("attachments", []):
-                    filename = att.get("name") or f"{topic_display}.pdf"
-                    url = att.get("baseUrl", "").rstrip("/") + "/" + att.get("key", "").lstrip("/")
-                    cols = st.columns([7, 1, 1])
-                    cols[0].write(filename)
-                    cols[1].markdown(f'[Link]({url})', unsafe_allow_html=True)
-                    try:
-                        resp = requests.get(url)
-                        if resp.ok:
-                            cols[2].download_button("Download", resp.content, file_name=filename, mime="application/pdf")
-                        else:
-                            cols[2].write("Unavailable")
-                    except Exception:
-                        cols[2].write("Unavailable")
-                    file_dict[filename] = url
-            if file_dict:
-                if st.button("Download All Notes as ZIP"):
-                    mem_zip = zip_files(file_dict)
-                    st.download_button("Download All Notes", mem_zip, file_name=f"{topic_name}_notes.zip")
+            index_documents(listing_documents(notes, "notes", topic_path, sel_batch_id, sel_subject_id, sel_topic_id))
+            render_attachment_table(notes, "Notes", topic_name, key=f"notes-{sel_topic_id}", suffix="notes")
         else:
-            st.info("No notes found for this topic.")
+            st.info("Notes for this topic are not available offline." if notes_entry["fetched_at"] is None
+                    and cache.is_offline() else "No notes found for this topic.")
 
     # --- DPP TAB ---
     elif tab == "DPP":
-        dpp = fetch_dpp(token, sel_batch_slug, sel_subject_slug, sel_topic_slug)
+        dpp_entry = listing_entry(token, "dpp", sel_batch_slug, sel_subject_slug, sel_topic_slug)
+        dpp = dpp_entry["value"]
         st.subheader(f"DPPs for Topic: {topic_name}")
+        render_staleness(dpp_entry, "DPPs")
         if dpp:
-            col1, col2, col3 = st.columns([7, 1, 1])
-            col1.write("Name")
-            col2.write("View")
-            col3.write("Download")
-            for entry in reversed(dpp):
-                topic_display = entry.get("topic") or "Untitled"
-                for att in entry.get("attachments", []):
-                    filename = att.get("name") or f"{topic_display}.pdf"
-                    url = att.get("baseUrl", "").rstrip("/") + "/" + att.get("key", "").lstrip("/")
-                    cols = st.columns([7, 1, 1])
-                    cols[0].write(filename)
-                    cols[1].markdown(f'[Link]({url})', unsafe_allow_html=True)
-                    try:
-                        resp = requests.get(url)
-                        if resp.ok:
-                            cols[2].download_button("Download", resp.content, file_name=filename, mime="application/pdf")
-                        else:
-                            cols[2].write("Unavailable")
-                    except Exception:
-                        cols[2].write("Unavailable")
-                    file_dict[filename] = url
-            if file_dict:
-                if st.button("Download All DPPs as ZIP"):
-                    mem_zip = zip_files(file_dict)
-                    st.download_button("Download All DPPs", mem_zip, file_name=f"{topic_name}_dpp.zip")
+            index_documents(listing_documents(dpp, "dpp", topic_path, sel_batch_id, sel_subject_id, sel_topic_id))
+            render_attachment_table(dpp, "DPPs", topic_name, key=f"dpp-{sel_topic_id}", suffix="dpp")
         else:
-            st.info("No DPPs found for this topic.")
+            st.info("DPPs for this topic are not available offline." if dpp_entry["fetched_at"] is None
+                    and cache.is_offline() else "No DPPs found for this topic.")
 
     # --- DPP QUIZ/ANNOUNCEMENTS ---
     elif tab == "DPP-Quiz":
@@ -281,4 +421,6 @@ def main():
         st.info("Upcoming feature: Announcements will be shown here soon.")
 
 if __name__ == "__main__":
-    main()
+    # Opt-in profiling: PW_PROFILE=1 or ?profile=1 (slow reruns are written to data/profiles)
+    with profiling.rerun("streamlit.main", enabled=profiling.enabled(st.query_params.get("profile"))):
+        main()
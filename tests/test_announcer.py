@@ -0,0 +1,65 @@
+import pytest
+
+from core import announcer
+
+PAGE_SIZE = 10
+
+class Feed:
+    """Fake announcement listing, newest first, served PAGE_SIZE items per page."""
+
+    def __init__(self, count):
+        self.items = []
+        self.calls = 0
+        self.post(count)
+
+    def post(self, count, schedule_time=None):
+        start = len(self.items)
+        new = [{"_id": f"a{i}", "scheduleTime": schedule_time or f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}"}
+               for i in range(start, start + count)]
+        self.items = new[::-1] + self.items
+
+    def fetch(self, token, batch_id, page=1, verify=True):
+        self.calls += 1
+        return {"success": True, "announcements": self.items[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]}
+
+@pytest.fixture
+def feed(monkeypatch):
+    feed = Feed(5)
+    monkeypatch.setattr(announcer, "fetch_announcements", feed.fetch)
+    return feed
+
+def sync(mark, max_pages=20):
+    res = announcer.sync_announcements("token", "batch", mark, max_pages=max_pages, verify=False)
+    assert res["success"]
+    return res
+
+def ids(res):
+    return [ann["_id"] for ann in res["announcements"]]
+
+def test_steady_state_sync_is_one_request(feed):
+    mark = sync(None)["high_water"]
+    feed.post(3)
+    feed.calls = 0
+    res = sync(mark)
+    assert ids(res) == ["a7", "a6", "a5"]
+    assert feed.calls == 1
+    assert ids(sync(res["high_water"])) == []
+
+def test_items_sharing_the_marks_schedule_time_are_new(feed):
+    feed.post(1, schedule_time="2024-02-01T00:00:00")
+    mark = sync(None)["high_water"]
+    feed.post(1, schedule_time="2024-02-01T00:00:00")
+    assert ids(sync(mark)) == ["a6"]
+
+def test_truncated_sync_resumes_where_it_stopped(feed):
+    mark = sync(None)["high_water"]
+    feed.post(45)
+    first = sync(mark, max_pages=2)
+    assert first["truncated"] and ids(first) == [f"a{i}" for i in range(49, 29, -1)]
+    feed.post(2)
+    second = sync(first["high_water"], max_pages=3)
+    assert second["truncated"] and ids(second) == ["a51", "a50"] + [f"a{i}" for i in range(29, 21, -1)]
+    third = sync(second["high_water"], max_pages=5)
+    assert not third["truncated"] and ids(third) == [f"a{i}" for i in range(21, 4, -1)]
+    assert "gaps" not in third["high_water"]
+    assert ids(sync(third["high_water"])) == []
@@ -0,0 +1,33 @@
+import io
+import os
+import zipfile
+
+from core import archive, cache
+
+def test_archive_round_trips_through_zipfile():
+    members = {
+        "notes.txt": b"kinematics " * 10000,   # compresses well: deflated
+        "scan.pdf": os.urandom(200 * 1024),     # incompressible: stored
+        "रसायन नोट्स.txt": "बंधन".encode() * 100,
+        "empty.txt": b"",
+    }
+    data = archive.build_zip({name: (lambda content=content: content) for name, content in members.items()})
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == list(members)
+        methods = {info.filename: info.compress_type for info in zf.infolist()}
+        assert methods["notes.txt"] == zipfile.ZIP_DEFLATED
+        assert methods["scan.pdf"] == zipfile.ZIP_STORED
+        for name, content in members.items():
+            assert zf.read(name) == content
+
+def test_archive_skips_members_without_content():
+    data = archive.build_zip({"a.txt": lambda: b"a", "missing.pdf": lambda: None})
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.namelist() == ["a.txt"]
+
+def test_loaders_run_in_the_callers_offline_mode():
+    with cache.offline_mode():
+        data = archive.build_zip({f"{i}.txt": lambda: str(cache.is_offline()).encode() for i in range(8)})
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert {zf.read(name) for name in zf.namelist()} == {b"True"}
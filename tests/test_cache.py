@@ -0,0 +1,33 @@
+import pytest
+
+from core import cache, store
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+
+def test_empty_first_result_is_not_cached():
+    calls = []
+
+    def failing_fetch():
+        calls.append(1)
+        return []
+    entry = cache.cached_entry(("notes", "scope", "b", "s", "t"), failing_fetch, stale_after=600, default=[])
+    assert entry["value"] == [] and entry["fetched_at"] is None
+    assert cache.read(("notes", "scope", "b", "s", "t")) is None
+    cache.cached_entry(("notes", "scope", "b", "s", "t"), failing_fetch, stale_after=600, default=[])
+    assert len(calls) == 2
+
+def test_empty_result_keeps_the_previous_entry():
+    key = ("notes", "scope", "b", "s", "t")
+    cache.write(key, ["note"])
+    assert cache.cached(key, lambda: [], refresh=True) == ["note"]
+    assert cache.read(key)["value"] == ["note"]
+
+def test_has_batches_requires_a_non_empty_list():
+    key = ("batches", cache.token_scope("token"))
+    assert not store.has_batches("token")
+    cache.write(key, [])
+    assert not store.has_batches("token")
+    cache.write(key, [{"name": "Batch"}])
+    assert store.has_batches("token")
@@ -0,0 +1,245 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import cancel, http
+from core.limiter import limiter_for, priority
+
+@pytest.fixture(autouse=True)
+def policy():
+    saved = dict(http.POLICY)
+    http.configure(breaker_threshold=2, breaker_reset=60)
+    yield
+    http.POLICY.update(saved)
+
+def open_breaker(breaker):
+    for _ in range(http.POLICY["breaker_threshold"]):
+        breaker.record_failure()
+
+def test_breaker_opens_after_threshold_failures():
+    breaker = http.CircuitBreaker()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = http.CircuitBreaker()
+    open_breaker(breaker)
+    http.configure(breaker_reset=0)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_failed_trial_reopens_breaker():
+    breaker = http.CircuitBreaker()
+    open_breaker(breaker)
+    http.configure(breaker_reset=0)
+    assert breaker.allow()
+    breaker.record_failure()
+    http.configure(breaker_reset=60)
+    assert breaker.state == "open"
+
+def test_abandoned_trial_frees_the_breaker_without_a_failure():
+    breaker = http.CircuitBreaker()
+    open_breaker(breaker)
+    http.configure(breaker_reset=0)
+    assert breaker.allow()
+    failures = breaker.failures
+    breaker.abandon_trial()
+    assert breaker.allow()
+    assert breaker.failures == failures
+
+def test_abandon_trial_only_releases_the_owning_thread():
+    breaker = http.CircuitBreaker()
+    open_breaker(breaker)
+    http.configure(breaker_reset=0)
+    assert breaker.allow()
+    other = threading.Thread(target=breaker.abandon_trial)
+    other.start()
+    other.join()
+    assert not breaker.allow()
+
+@pytest.mark.parametrize("error", [cancel.Cancelled(), RuntimeError("boom")])
+def test_trial_ending_without_outcome_does_not_wedge_the_breaker(monkeypatch, error):
+    endpoint = f"test-trial-{type(error).__name__}"
+    breaker = http.get_breaker(endpoint)
+    open_breaker(breaker)
+    http.configure(breaker_reset=0)
+
+    def fail(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(http, "_hedged_get", fail)
+    with pytest.raises(type(error)):
+        http._resilient_get("http://example.invalid/x", None, endpoint, True, True)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+
+@pytest.mark.parametrize("hedge, sends", [(True, 2), (False, 1)])
+def test_only_hedged_gets_send_a_second_request(monkeypatch, hedge, sends):
+    http.configure(hedge_after=0.1)
+    calls = []
+
+    def slow_request(outcome, *args, **kwargs):
+        calls.append(1)
+        time.sleep(0.3)
+        outcome["status"] = 200
+        return "response"
+    monkeypatch.setattr(http, "_request", slow_request)
+    assert http._hedged_get("http://example.invalid/x", None, 5, "test-hedge", hedge) == "response"
+    assert len(calls) == sends
+
+def run_concurrently(*targets, stagger=0.05):
+    threads = []
+    for target in targets:
+        thread = threading.Thread(target=target)
+        thread.start()
+        threads.append(thread)
+        time.sleep(stagger)
+    for thread in threads:
+        thread.join(timeout=5)
+
+def test_single_flight_shares_one_call():
+    calls, results = [], []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.2)
+        return "response"
+
+    run_concurrently(*[lambda: results.append(http.single_flight("shared", fn))] * 5, stagger=0.01)
+    assert len(calls) == 1
+    assert results == ["response"] * 5
+    assert http.in_flight_count() == 0
+
+def test_single_flight_shares_errors():
+    errors = []
+
+    def fn():
+        time.sleep(0.1)
+        raise ValueError("upstream")
+
+    def call():
+        try:
+            http.single_flight("failing", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    run_concurrently(call, call, stagger=0.01)
+    assert len(errors) == 2
+
+def test_waiter_reruns_call_after_leader_is_cancelled():
+    scope = cancel.CancelScope()
+    calls, outcome = [], {}
+
+    def fn():
+        calls.append(1)
+        deadline = time.monotonic() + 1
+        while time.monotonic() < deadline:
+            cancel.check()
+            time.sleep(0.01)
+        return "response"
+
+    def leader():
+        with cancel.scope(scope):
+            try:
+                http.single_flight("cancelled-leader", fn)
+            except cancel.Cancelled:
+                outcome["leader"] = "cancelled"
+
+    def follower():
+        outcome["follower"] = http.single_flight("cancelled-leader", fn)
+
+    threading.Timer(0.15, scope.cancel).start()
+    run_concurrently(leader, follower)
+    assert outcome == {"leader": "cancelled", "follower": "response"}
+    assert len(calls) == 2
+
+def test_waiter_in_the_cancelled_scope_gives_up():
+    scope = cancel.CancelScope()
+    outcome = []
+
+    def fn():
+        while True:
+            cancel.check()
+            time.sleep(0.01)
+
+    def call():
+        with cancel.scope(scope):
+            try:
+                http.single_flight("same-scope", fn)
+            except cancel.Cancelled:
+                outcome.append("cancelled")
+
+    threading.Timer(0.15, scope.cancel).start()
+    run_concurrently(call, call)
+    assert outcome == ["cancelled", "cancelled"]
+
+@pytest.mark.parametrize("leader_class, follower_class, expected_calls", [
+    ("background", "interactive", 2),
+    ("interactive", "background", 1),
+    ("background", "background", 1),
+])
+def test_single_flight_never_makes_interactive_wait_on_background(leader_class, follower_class, expected_calls):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.2)
+        return "response"
+
+    def call(name):
+        def run():
+            with priority(name):
+                http.single_flight("priority", fn)
+        return run
+
+    run_concurrently(call(leader_class), call(follower_class))
+    assert len(calls) == expected_calls
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(0.3)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def slow_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+def test_interactive_get_is_not_queued_behind_background_gets(slow_server):
+    lim = limiter_for(slow_server)
+    lim.limit = lim.min_limit = lim.max_limit = 4
+    lim.rate = lim.tokens = lim.burst = 1000
+
+    def background(i):
+        def run():
+            with priority("background"):
+                http.http_get(f"{slow_server}/bulk/{i}", endpoint="test-bulk")
+        return run
+
+    threads = [threading.Thread(target=background(i)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    start = time.monotonic()
+    resp = http.http_get(f"{slow_server}/click", endpoint="test-click")
+    waited = time.monotonic() - start
+    for thread in threads:
+        thread.join(timeout=10)
+    assert resp.status_code == 200
+    assert waited < 1.0
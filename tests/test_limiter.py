@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from core import cancel, limiter
+from core.limiter import AdaptiveLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(limiter, "time", fake)
+    return fake
+
+def round_trip(lim, clock, latency, status=200, n=8, endpoint="contents"):
+    """n concurrent requests that all finish after `latency` seconds."""
+    for _ in range(n):
+        lim.acquire()
+    clock.now += latency
+    for _ in range(n):
+        lim.release(latency, status, endpoint=endpoint)
+    lim.tokens = lim.burst
+
+def test_window_grows_while_utilised(clock):
+    lim = AdaptiveLimiter(initial=8, max_limit=32)
+    for _ in range(20):
+        round_trip(lim, clock, 0.05)
+    assert lim.limit > 10
+
+def test_window_does_not_grow_when_idle(clock):
+    lim = AdaptiveLimiter(initial=8, max_limit=32)
+    for _ in range(20):
+        round_trip(lim, clock, 0.05, n=1)
+    assert lim.limit == 8
+
+def test_throttling_shrinks_once_per_round_trip(clock):
+    lim = AdaptiveLimiter(initial=16, min_limit=1)
+    round_trip(lim, clock, 0.05)
+    round_trip(lim, clock, 0.05, status=503)
+    assert lim.limit == pytest.approx(16 * limiter.LIMITS["backoff"], rel=0.05)
+
+def test_latency_shift_becomes_the_new_baseline(clock):
+    lim = AdaptiveLimiter(initial=16, min_limit=1, max_limit=32)
+    for _ in range(50):
+        round_trip(lim, clock, 0.05)
+    for _ in range(200):
+        round_trip(lim, clock, 0.2)
+    assert lim.limit >= 16
+    assert lim.stats()["baseline_ms"]["contents"] == pytest.approx(200, rel=0.01)
+
+def test_baselines_are_per_endpoint(clock):
+    lim = AdaptiveLimiter(initial=16, min_limit=1, max_limit=32)
+    for _ in range(20):
+        round_trip(lim, clock, 0.02, endpoint="verify-token")
+        round_trip(lim, clock, 0.5, endpoint="contents")
+    before = lim.limit
+    round_trip(lim, clock, 0.5, endpoint="contents")
+    assert lim.limit >= before
+
+def test_cancelled_request_frees_its_slot_without_shrinking(clock):
+    lim = AdaptiveLimiter(initial=4)
+    lim.acquire()
+    lim.release(5.0, error=True, cancelled=True)
+    assert lim.limit == 4
+    assert lim.in_flight == 0
+
+def test_waiting_request_gives_up_when_cancelled():
+    lim = AdaptiveLimiter(initial=1, min_limit=1, max_limit=1)
+    lim.acquire()
+    scope = cancel.CancelScope()
+    outcome = []
+
+    def waiter():
+        with cancel.scope(scope):
+            try:
+                lim.acquire()
+                outcome.append("acquired")
+            except cancel.Cancelled:
+                outcome.append("cancelled")
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.05)
+    scope.cancel()
+    thread.join(timeout=1)
+    assert outcome == ["cancelled"]
+    assert lim.stats()["waiting"] == {"interactive": 0, "background": 0}